@@ -0,0 +1,228 @@
+# Description: Recommends which entry point to shoot next in a Black Box
+#              game. Every layout the AtomSolver still has as a candidate
+#              is equally likely, so the information a ray gives is the
+#              entropy of its outcome over those layouts, read from the
+#              SignatureTable rather than traced. Each unused entry point
+#              is ranked by that information per point it is expected to
+#              cost: 1 for the entry point, plus the chance that the ray
+#              leaves through an exit point not used before. The outcomes
+#              of every layout are counted once up front, so when more
+#              than half the layouts are candidates only the others are
+#              counted and taken away. Counting is split over a pool of
+#              worker processes, each holding the table's signatures from
+#              when it started, when there are many candidates. Run from
+#              the repository root with
+#                  python advisor.py --table four_atoms.npz
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+
+from black_box import BlackBoxGame, entry_point_index
+from solver import AtomSolver, SignatureTable
+
+# outcome columns of the table, set in each worker process when it starts
+_worker_columns = None
+
+
+def _start_worker(columns):
+    """
+    Keeps the outcome columns in a worker process, so each job only sends candidate
+    indices
+    :param columns: array of shape (entry points, layouts), see outcome_counts
+    """
+    global _worker_columns
+    _worker_columns = columns
+
+
+def outcome_counts(columns, candidates, ports):
+    """
+    Counts how many of the candidate layouts give each outcome for each of the given entry
+    points
+    :param columns: the transpose of the signatures array of a SignatureTable, stored
+                    contiguously so each entry point's outcomes are read in one sweep
+    :param candidates: array of layout indices
+    :param ports: array of entry point numbers
+    :return: integer array of shape (len(ports), entry points + 2), where [i, outcome + 2]
+             is the number of candidates on which entry point ports[i] gives outcome
+    """
+    width = len(columns) + 2
+    unsigned = np.dtype('u%d' % columns.itemsize)
+    counts = np.empty((len(ports), width), dtype=np.int64)
+    for i, port in enumerate(ports):
+        outcomes = columns[port][candidates]
+        outcomes += 2
+        counts[i] = np.bincount(outcomes.view(unsigned), minlength=width)
+    return counts
+
+
+def _count_in_worker(job):
+    """
+    Runs outcome_counts in a worker process
+    :param job: tuple of (array of layout indices, array of entry point numbers)
+    :return: integer array, see outcome_counts
+    """
+    candidates, ports = job
+    return outcome_counts(_worker_columns, candidates, ports)
+
+
+class RayAdvisor:
+    """
+    Ranks the entry points of games played on the layouts of one SignatureTable. The worker
+    processes are started once, when the advisor is made, and kept until close is called.
+    """
+
+    # fewest candidates worth splitting over the workers, below which sending the work to
+    # them takes longer than doing it
+    PARALLEL_MINIMUM = 100000
+
+    def __init__(self, table, workers=None):
+        """
+        :param table: SignatureTable of the games' board size and number of atoms
+        :param workers: integer number of worker processes, defaults to the number of CPUs.
+                        With 1 everything is counted in this process.
+        """
+        self._table = table
+        self._columns = np.ascontiguousarray(table.build().T)
+        layouts = self._columns.shape[1]
+        self._all_counts = outcome_counts(self._columns, np.arange(layouts),
+                                          np.arange(len(self._columns)))
+        self._workers = workers or os.cpu_count() or 1
+        self._pool = None
+        if self._workers > 1:
+            self._pool = multiprocessing.Pool(self._workers, _start_worker, (self._columns,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def _counts(self, candidates, ports):
+        """
+        Runs outcome_counts, on the layouts that are not candidates if they are fewer, and
+        split over the workers if there are enough layouts to count
+        :param candidates: array of layout indices
+        :param ports: array of entry point numbers
+        :return: integer array, see outcome_counts
+        """
+        layouts = self._columns.shape[1]
+        others = None
+        if len(candidates) > layouts // 2:
+            others = np.ones(layouts, dtype=bool)
+            others[candidates] = False
+            candidates = np.flatnonzero(others)
+        else:
+            candidates = np.asarray(candidates, dtype=np.intp)
+
+        if self._pool is None or len(candidates) < self.PARALLEL_MINIMUM:
+            counts = outcome_counts(self._columns, candidates, ports)
+        else:
+            jobs = [(chunk, ports) for chunk in np.array_split(candidates, self._workers)]
+            counts = sum(self._pool.map(_count_in_worker, jobs))
+        if others is not None:
+            counts = self._all_counts[ports] - counts
+        return counts
+
+    def rank(self, candidates, used_points=()):
+        """
+        Ranks the entry points not used yet, best first. An entry point's value is the
+        bits of information its ray is expected to give divided by the points it is
+        expected to cost. Points already used are left out: rays can be followed backwards,
+        so shooting from an exit tells nothing the ray that left through it did not.
+        :param candidates: array of the indices of the layouts still possible, as returned
+                           by AtomSolver.candidate_indices
+        :param used_points: list of (row, column) tuples of the entry/exit points used
+        :return: list of (entry point, expected bits, expected points) tuples, where entry
+                 point is a (row, column) tuple
+        """
+        entries = self._table.entries
+        size = self._table.size
+        used = np.zeros(len(entries), dtype=bool)
+        for row, column in used_points:
+            used[entry_point_index(row, column, size)] = True
+        ports = np.flatnonzero(~used)
+        if not len(ports) or not len(candidates):
+            return []
+
+        probabilities = self._counts(candidates, ports) / len(candidates)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bits = -np.where(probabilities > 0, probabilities * np.log2(probabilities),
+                             0).sum(axis=1)
+
+        # outcome columns of exits through entry points not used yet, each costing a point
+        new_exit = np.zeros(probabilities.shape[1], dtype=bool)
+        new_exit[ports + 2] = True
+        points = 1 + probabilities[:, new_exit].sum(axis=1)
+
+        ranking = [(entries[port], float(bits[i]), float(points[i]))
+                   for i, port in enumerate(ports)]
+        ranking.sort(key=lambda advice: (-advice[1] / advice[2], -advice[1]))
+        return ranking
+
+    def advise(self, game, solver):
+        """
+        Ranks the entry points of a game, see rank
+        :param game: BlackBoxGame or CompactBlackBoxGame being played
+        :param solver: AtomSolver that has been told the result of every ray shot in it
+        :return: list of (entry point, expected bits, expected points) tuples, best first
+        """
+        return self.rank(solver.candidate_indices(), game.get_used_points())
+
+
+def main(argv=None):
+    """
+    Plays games on random layouts by always shooting the top ranked entry point, printing
+    how long each ranking took
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Recommend the next ray to shoot')
+    parser.add_argument('--atoms', type=int, default=4)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--table', metavar='PATH',
+                        help='.npz signature table to use, built and saved there if missing')
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    table = SignatureTable.load_or_build(args.table, args.atoms, args.size)
+
+    rng = random.Random(args.seed)
+    with RayAdvisor(table, args.workers) as advisor:
+        for _ in range(args.games):
+            atoms = table.layout_atoms(rng.randrange(len(table.layouts)))
+            game = BlackBoxGame(atoms, table.size)
+            solver = AtomSolver(table)
+            print('atoms %s' % (atoms,))
+            while solver.candidate_count() > 1:
+                start = time.perf_counter()
+                ranking = advisor.advise(game, solver)
+                elapsed = time.perf_counter() - start
+                if not ranking or ranking[0][1] == 0:
+                    break
+                entry, bits, points = ranking[0]
+                exit_point = game.shoot_ray(entry[0], entry[1])
+                print('  %7d candidates, ranked in %6.1f ms: shoot %s (%.2f bits for %.2f '
+                      'points) -> %s' % (solver.candidate_count(), elapsed * 1000, entry,
+                                         bits, points, exit_point))
+                solver.observe(entry, exit_point)
+            print('  %d candidates left, score %d' % (solver.candidate_count(),
+                                                     game.get_score()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+# Description: Traces rays on many Black Box boards at once with NumPy.
+#              Every (board, entry point) pair is one lane, and all
+#              lanes are advanced together one step at a time using the
+#              same rules as BlackBoxGame.follow_ray, so a whole stack of
+#              atom layouts can be evaluated without a Python loop per
+#              ray. Running this file checks the results against
+#              BlackBoxGame.shoot_ray on random layouts.
+
+import argparse
+import random
+
+import numpy as np
+
+from black_box import DEFLECTION_RULES, BlackBoxGame, entry_points
+
+# outcome codes used alongside exit point indices in the arrays returned by trace_rays
+HIT = -1
+REFLECTION = -2
+
+# most rays traced at once by trace_rays, which bounds its memory use to tens of megabytes
+CHUNK_LANES = 1 << 18
+
+# direction numbers used by the lanes, and DEFLECTION_RULES laid out as arrays indexed by them
+_DIRECTIONS = ('right', 'left', 'up', 'down')
+_STEP_ROW = np.array([DEFLECTION_RULES[d][0][0] for d in _DIRECTIONS], dtype=np.int64)
+_STEP_COL = np.array([DEFLECTION_RULES[d][0][1] for d in _DIRECTIONS], dtype=np.int64)
+_FIRST_ROW = np.array([DEFLECTION_RULES[d][1][0] for d in _DIRECTIONS], dtype=np.int64)
+_FIRST_COL = np.array([DEFLECTION_RULES[d][1][1] for d in _DIRECTIONS], dtype=np.int64)
+_FIRST_TURN = np.array([_DIRECTIONS.index(DEFLECTION_RULES[d][2]) for d in _DIRECTIONS],
+                       dtype=np.int8)
+_SECOND_ROW = np.array([DEFLECTION_RULES[d][3][0] for d in _DIRECTIONS], dtype=np.int64)
+_SECOND_COL = np.array([DEFLECTION_RULES[d][3][1] for d in _DIRECTIONS], dtype=np.int64)
+_SECOND_TURN = np.array([_DIRECTIONS.index(DEFLECTION_RULES[d][4]) for d in _DIRECTIONS],
+                        dtype=np.int8)
+_STEP_ROW16 = _STEP_ROW.astype(np.int16)
+_STEP_COL16 = _STEP_COL.astype(np.int16)
+
+
+def port_index(row, column, size=10):
+    """
+    Returns the index of an entry/exit point in black_box.entry_points(size). Works on
+    plain integers as well as NumPy arrays of border squares
+    :param row: row (or array of rows) of the entry/exit points
+    :param column: column (or array of columns) of the entry/exit points
+    :param size: integer representing the number of rows (and columns) of the board
+    :return: index (or array of indices) of the entry/exit points
+    """
+    last = size - 1
+    inner = size - 2
+    return np.where(row == 0, column - 1,
+                    np.where(row == last, inner + column - 1,
+                             np.where(column == 0, 2 * inner + row - 1, 3 * inner + row - 1)))
+
+
+def boards_from_layouts(atom_configs, size=10):
+    """
+    Builds a stack of boards from a list of atom layouts
+    :param atom_configs: list of lists of (row, column) tuples of atom locations
+    :param size: integer representing the number of rows (and columns) of the boards
+    :return: boolean array of shape (len(atom_configs), size, size), True where an atom is
+    """
+    boards = np.zeros((len(atom_configs), size, size), dtype=bool)
+    for index, atoms in enumerate(atom_configs):
+        for row, column in atoms:
+            boards[index, row, column] = True
+    return boards
+
+
+def boards_from_cells(layouts, size=10):
+    """
+    Builds a stack of boards from an array of layouts given as cell numbers
+    :param layouts: integer array of shape (layouts, atoms) of cell numbers
+                    (row * size + column)
+    :param size: integer representing the number of rows (and columns) of the boards
+    :return: boolean array of shape (len(layouts), size, size), True where an atom is
+    """
+    boards = np.zeros((len(layouts), size * size), dtype=bool)
+    boards[np.arange(len(layouts))[:, None], layouts] = True
+    return boards.reshape(-1, size, size)
+
+
+def trace_rays(atom_configs, entries, size=10, out=None):
+    """
+    Shoots a ray from each of the given entry points on each of the given boards, without
+    any scoring. Raises ValueError if an entry is not an allowed entry point. The boards
+    are traced CHUNK_LANES rays at a time, so the memory used does not grow with the
+    number of boards beyond that of the result.
+    :param atom_configs: a boolean array of shape (boards, size, size) that is True where
+                         an atom is, an integer array of shape (boards, atoms) of cell
+                         numbers (row * size + column), or a list of lists of (row, column)
+                         tuples of atom locations
+    :param entries: list of (row, column) tuples of allowed entry points
+    :param size: integer representing the number of rows (and columns) of the boards, not
+                 used when atom_configs is an array of boards
+    :param out: optional integer array of shape (boards, len(entries)) to write the outcomes
+                into, such as an int8 array when there are fewer than 128 entry points
+    :return: out, or a new int16 array of shape (boards, len(entries)), holding the index of
+             the exit point in black_box.entry_points(size), HIT if a hit occurs or
+             REFLECTION if the ray comes back out of its own entry point
+    """
+    if isinstance(atom_configs, np.ndarray) and atom_configs.ndim == 3:
+        size = atom_configs.shape[1]
+        make_boards = lambda start, stop: atom_configs[start:stop].astype(bool, copy=False)
+    elif isinstance(atom_configs, np.ndarray):
+        make_boards = lambda start, stop: boards_from_cells(atom_configs[start:stop], size)
+    else:
+        make_boards = lambda start, stop: boards_from_layouts(atom_configs[start:stop], size)
+    board_count = len(atom_configs)
+
+    allowed = set(entry_points(size))
+    for entry in entries:
+        if tuple(entry) not in allowed:
+            raise ValueError('%r is not an allowed entry point' % (entry,))
+    entries = np.array(entries, dtype=np.int16).reshape(-1, 2)
+    if out is None:
+        out = np.zeros((board_count, len(entries)), dtype=np.int16)
+    if len(entries):
+        chunk = max(1, CHUNK_LANES // len(entries))
+        for start in range(0, board_count, chunk):
+            stop = min(start + chunk, board_count)
+            out[start:stop] = _trace_boards(make_boards(start, stop), entries)
+    return out
+
+
+def _trace_boards(boards, entries):
+    """
+    Shoots a ray from each entry point on each of a chunk of boards, see trace_rays
+    :param boards: boolean array of shape (boards, size, size)
+    :param entries: int16 array of shape (entry points, 2) of allowed entry points
+    :return: int16 array of shape (boards, entry points) of outcomes
+    """
+    board_count, size = boards.shape[:2]
+    last = size - 1
+    entry_count = len(entries)
+    results = np.zeros((board_count, entry_count), dtype=np.int16)
+    if board_count == 0:
+        return results
+
+    # move from a cell to the next, and to the diagonals ahead, for each direction number
+    step_offset = (_STEP_ROW * size + _STEP_COL).astype(np.int32)
+    first_offset = (_FIRST_ROW * size + _FIRST_COL).astype(np.int32)
+    second_offset = (_SECOND_ROW * size + _SECOND_COL).astype(np.int32)
+
+    # one lane per (board, entry) pair, in the same order as results.ravel(). Rows and
+    # columns are kept as int16 for the border checks, and the lane's cell in the whole
+    # stack of boards as int32 (or int64 for very large stacks) for looking at squares
+    flat = np.ascontiguousarray(boards).reshape(-1)
+    cell_type = np.int32 if flat.size < np.iinfo(np.int32).max else np.int64
+    lane = np.arange(board_count * entry_count, dtype=cell_type)
+    row = np.tile(entries[:, 0], board_count)
+    column = np.tile(entries[:, 1], board_count)
+    cell = ((lane // entry_count) * (size * size) +
+            row.astype(cell_type) * size + column)
+    entry_port = port_index(row, column, size).astype(np.int16)
+
+    # initial direction is away from the border the ray enters through
+    direction = np.where(row == 0, 3, np.where(row == last, 2,
+                                               np.where(column == 0, 0, 1))).astype(np.int8)
+    moved = np.zeros(lane.shape, dtype=bool)  # moved since its last turn
+    left_entry = np.zeros(lane.shape, dtype=bool)  # moved at all since being shot
+    turns = np.zeros(lane.shape, dtype=np.int8)  # deflections since the ray last moved
+    outcome = results.reshape(-1)
+
+    while lane.size:
+        # rays that have moved onto the border since their last turn leave the board
+        exited = moved & ((row == 0) | (row == last) | (column == 0) | (column == last))
+
+        # peek at next position, if it causes a hit the ray is finished. Rays that just
+        # exited look around square (1, 1) of the first board instead, so every lookup
+        # stays inside the stack
+        look = np.where(exited, size + 1, cell)
+        hit = ~exited & flat[look + step_offset[direction]]
+
+        # look at the diagonals ahead to see if a deflection occurs
+        running = ~(exited | hit)
+        first = running & flat[look + first_offset[direction]]
+        second = running & ~first & flat[look + second_offset[direction]]
+        turned = first | second
+
+        # a ray deflected before leaving its entry point, or boxed in, is a reflection
+        reflected = turned & (~left_entry | (turns == 3))
+
+        exit_port = port_index(row[exited], column[exited], size)
+        outcome[lane[exited]] = np.where(exit_port == entry_port[exited], REFLECTION, exit_port)
+        outcome[lane[hit]] = HIT
+        outcome[lane[reflected]] = REFLECTION
+
+        # move the rays that were not deflected forward, and turn the others
+        forward = running & ~turned
+        row = row + _STEP_ROW16[direction] * forward
+        column = column + _STEP_COL16[direction] * forward
+        cell = cell + step_offset[direction] * forward
+        direction = np.where(first, _FIRST_TURN[direction],
+                             np.where(second, _SECOND_TURN[direction], direction))
+        turns = np.where(turned, turns + 1, 0).astype(np.int8)
+        moved = forward
+        left_entry |= forward
+
+        # drop the finished rays
+        keep = running & ~reflected
+        lane = lane[keep]
+        cell = cell[keep]
+        row = row[keep]
+        column = column[keep]
+        entry_port = entry_port[keep]
+        direction = direction[keep]
+        moved = moved[keep]
+        left_entry = left_entry[keep]
+        turns = turns[keep]
+    return results
+
+
+def outcome_to_exit(outcome, entry, size=10):
+    """
+    Converts an outcome code from trace_rays into what BlackBoxGame.shoot_ray returns
+    :param outcome: integer outcome for the given entry point
+    :param entry: (row, column) tuple of the entry point the ray was shot from
+    :param size: integer representing the number of rows (and columns) of the board
+    :return: None if hit occurs
+    :return: tuple (row, column) of the exit point of the ray
+    """
+    if outcome == HIT:
+        return None
+    if outcome == REFLECTION:
+        return tuple(entry)
+    return entry_points(size)[outcome]
+
+
+def main(argv=None):
+    """
+    Checks trace_rays against BlackBoxGame.shoot_ray for every entry point of a number of
+    random layouts and prints how many outcomes disagree
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Check trace_rays against shoot_ray')
+    parser.add_argument('--boards', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--max-atoms', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    interior = [(row, column) for row in range(1, args.size - 1)
+                for column in range(1, args.size - 1)]
+    layouts = [rng.sample(interior, rng.randint(0, args.max_atoms))
+               for _ in range(args.boards)]
+    entries = entry_points(args.size)
+    results = trace_rays(layouts, entries, args.size)
+
+    mismatches = 0
+    for layout, outcomes in zip(layouts, results):
+        game = BlackBoxGame(layout, args.size)
+        for entry, outcome in zip(entries, outcomes):
+            if game.shoot_ray(entry[0], entry[1]) != outcome_to_exit(outcome, entry, args.size):
+                mismatches += 1
+    print('%d rays checked, %d mismatches' % (results.size, mismatches))
+    return mismatches
+
+
+if __name__ == '__main__':
+    raise SystemExit(1 if main() else 0)
@@ -0,0 +1,100 @@
+# Description: Compares the memory held by, and the time taken to
+#              construct, a BlackBoxGame and a CompactBlackBoxGame with
+#              the same atoms. Run from the repository root with
+#              python -m benchmarks.compact_backend
+
+import argparse
+import random
+import sys
+import timeit
+import tracemalloc
+
+from black_box import BlackBoxGame
+from compact_black_box import CompactBlackBoxGame
+
+
+def random_layouts(count, atoms=4, size=10, seed=0):
+    """
+    Builds a list of random atom layouts
+    :param count: integer number of layouts to build
+    :param atoms: integer number of atoms in each layout
+    :param size: integer number of rows (and columns) of the board
+    :param seed: seed for the random number generator
+    :return: list of lists of (row, column) tuples
+    """
+    rng = random.Random(seed)
+    interior = [(row, column) for row in range(1, size - 1) for column in range(1, size - 1)]
+    return [rng.sample(interior, atoms) for _ in range(count)]
+
+
+def bytes_per_game(game_class, layouts, moves):
+    """
+    Measures the memory held by live games of the given class, after each has had the
+    same moves played on it, divided by the number of games. The layouts themselves are
+    allocated before measuring starts, so only memory owned by the games is counted.
+    :param game_class: BlackBoxGame or CompactBlackBoxGame
+    :param layouts: list of atom layouts, one game is made for each
+    :param moves: list of (row, column) squares that are shot at and then guessed
+    :return: float of bytes allocated per game
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = []
+    for layout in layouts:
+        game = game_class(layout)
+        for row, column in moves:
+            game.shoot_ray(row, column)
+            game.guess_atom(row, column)
+        games.append(game)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(games)
+
+
+def construction_time(game_class, layouts, repeat):
+    """
+    Measures the best average time taken to construct one game of the given class
+    :param game_class: BlackBoxGame or CompactBlackBoxGame
+    :param layouts: list of atom layouts, one game is made for each per run
+    :param repeat: integer number of runs, the fastest is used
+    :return: float of seconds per construction
+    """
+    def construct():
+        for layout in layouts:
+            game_class(layout)
+    return min(timeit.repeat(construct, number=1, repeat=repeat)) / len(layouts)
+
+
+def main(argv=None):
+    """
+    Runs the comparison and prints the results. Exits with status 1 if the compact
+    backend is not at least the required factors smaller and faster to construct.
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(
+        description='Compare memory and construction time of the two game classes')
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--memory-factor', type=float, default=10.0)
+    parser.add_argument('--construction-factor', type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    layouts = random_layouts(args.games)
+    moves = [(0, 3), (4, 9), (9, 6), (3, 0)]
+
+    results = {}
+    for game_class in (BlackBoxGame, CompactBlackBoxGame):
+        results[game_class] = (bytes_per_game(game_class, layouts, moves),
+                               construction_time(game_class, layouts, args.repeat))
+        print('%-20s %8.0f bytes/game %8.2f us/construction' %
+              (game_class.__name__, results[game_class][0], results[game_class][1] * 1e6))
+
+    memory_factor = results[BlackBoxGame][0] / results[CompactBlackBoxGame][0]
+    time_factor = results[BlackBoxGame][1] / results[CompactBlackBoxGame][1]
+    print('memory %.1fx smaller, construction %.1fx faster' % (memory_factor, time_factor))
+    if memory_factor < args.memory_factor or time_factor < args.construction_factor:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+# Description: Repeatable timings of the hot paths of BlackBoxGame. Each
+#              workload is timed several times and the best and median
+#              time per call are recorded. Results can be saved as a
+#              JSON baseline and later runs compared against it, which
+#              lists every workload that got slower than allowed and
+#              exits with status 1 if there were any. The shoot_ray
+#              instrumentation hook is checked to cost nothing while
+#              turned off, by timing shoot_ray against a copy of it kept
+#              here with the hook left out. Run from the repository root with
+#                  python -m benchmarks.suite --save baseline.json
+#                  python -m benchmarks.suite --compare baseline.json
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+
+import instrumentation
+from black_box import BlackBoxGame, entry_points
+
+# a ray shot from (0, 5) is deflected 7 times before leaving at (6, 9)
+_ZIG_ZAG_ATOMS = [(1, 3), (3, 1), (3, 2), (3, 6), (5, 3), (8, 3), (8, 6), (8, 8)]
+
+
+def staircase_atoms(size):
+    """
+    Builds a layout in which a ray shot from (2, 0) zig-zags down and to the right,
+    alternately deflected down and right by each atom until it reaches the far corner
+    :param size: integer number of rows (and columns) of the board
+    :return: list of (row, column) tuples of atom locations
+    """
+    atoms = []
+    step = 0
+    while 5 + 2 * step <= size - 2:
+        atoms.append((1 + 2 * step, 3 + 2 * step))
+        atoms.append((5 + 2 * step, 1 + 2 * step))
+        step += 1
+    return atoms
+
+
+def _trace(atoms, entry, size=10):
+    """
+    Makes a workload that traces one ray, bypassing the ray outcome cache
+    :param atoms: list of (row, column) tuples of atom locations
+    :param entry: (row, column) tuple of the entry point
+    :param size: integer number of rows (and columns) of the board
+    :return: function taking no arguments
+    """
+    game = BlackBoxGame(atoms, size)
+    row, column = entry
+    return lambda: game.trace_ray(row, column)
+
+
+def _shoot_first(atoms, entry):
+    """
+    Makes a workload that shoots one ray on a game that has not shot it before, so the ray
+    is traced and scored. The game's cached outcomes and used entry/exit points are
+    cleared before each shot.
+    :param atoms: list of (row, column) tuples of atom locations
+    :param entry: (row, column) tuple of the entry point
+    :return: function taking no arguments
+    """
+    game = BlackBoxGame(atoms)
+    row, column = entry
+
+    def shoot():
+        game._ray_outcomes.clear()
+        game._entry_and_exit_points.clear()
+        game.shoot_ray(row, column)
+    return shoot
+
+
+class UnhookedBlackBoxGame(BlackBoxGame):
+    """
+    BlackBoxGame whose shoot_ray has no instrumentation hook, to time the hook against.
+    shoot_ray is a copy of BlackBoxGame.shoot_ray, so it must be kept in step with it.
+    """
+
+    def shoot_ray(self, row, column):
+        """
+        BlackBoxGame.shoot_ray without the instrumentation hook
+        :param row: integer representing the desired row on the game board
+        :param column: integer representing the desired column on the game board
+        :return: what BlackBoxGame.shoot_ray returns
+        """
+        if self._undo_moves is not None:
+            self._journal_move('shoot_ray', row, column)
+
+        if not self.is_entry_point(row, column):
+            return False
+
+        if (row, column) not in self._entry_and_exit_points:
+            self._entry_and_exit_points.append((row, column))
+            self._score -= 1
+
+        try:
+            exit_point = self._ray_outcomes[(row, column)]
+        except KeyError:
+            exit_point = self._cache_ray((row, column))
+
+        if exit_point is not None and exit_point not in self._entry_and_exit_points:
+            self._entry_and_exit_points.append(exit_point)
+            self._score -= 1
+        return exit_point
+
+
+def _shoot_repeat(atoms, game_class=BlackBoxGame):
+    """
+    Makes a workload that shoots every entry point of a game that has already shot them
+    all, so only the cached outcomes and the score bookkeeping are used
+    :param atoms: list of (row, column) tuples of atom locations
+    :param game_class: BlackBoxGame, or a subclass of it to time instead
+    :return: function taking no arguments
+    """
+    game = game_class(atoms)
+    entries = entry_points()
+    for row, column in entries:
+        game.shoot_ray(row, column)
+
+    def shoot():
+        for row, column in entries:
+            game.shoot_ray(row, column)
+    return shoot
+
+
+def _shoot_instrumented(atoms):
+    """
+    Makes a workload that shoots every entry point of a game, as _shoot_repeat does, with
+    ray instrumentation turned on. Comparing it with _shoot_repeat shows the cost of the
+    instrumentation when on; hook_overhead checks the cost when off.
+    :param atoms: list of (row, column) tuples of atom locations
+    :return: function taking no arguments
+    """
+    shoot_all = _shoot_repeat(atoms)
+    recorder = instrumentation.RayInstrumentation([instrumentation.RingBufferSink(100)])
+
+    def shoot():
+        instrumentation.enable(recorder)
+        try:
+            shoot_all()
+        finally:
+            instrumentation.disable()
+    return shoot
+
+
+def _guess_with_history(history, size=100):
+    """
+    Makes a workload that repeats a guess in a game that already has many guesses
+    :param history: integer number of distinct wrong guesses made beforehand
+    :param size: integer number of rows (and columns) of the board
+    :return: function taking no arguments
+    """
+    game = BlackBoxGame([(1, 1)], size)
+    for cell in range(history):
+        game.guess_atom(2 + cell // (size - 3), 2 + cell % (size - 3))
+    last = (2 + (history - 1) // (size - 3), 2 + (history - 1) % (size - 3))
+    return lambda: (game.guess_atom(last[0], last[1]), game.guess_atom(1, 1))
+
+
+def _playthrough(atoms):
+    """
+    Makes a workload that plays a whole game: every entry point is shot, then every
+    interior square is guessed in order until all atoms are found
+    :param atoms: list of (row, column) tuples of atom locations
+    :return: function taking no arguments
+    """
+    entries = entry_points()
+    interior = [(row, column) for row in range(1, 9) for column in range(1, 9)]
+
+    def play():
+        game = BlackBoxGame(atoms)
+        for row, column in entries:
+            game.shoot_ray(row, column)
+        for row, column in interior:
+            if game.atoms_left() == 0:
+                break
+            game.guess_atom(row, column)
+    return play
+
+
+def _clone(atoms):
+    """
+    Makes a workload that clones a game part way through, as a search does at each node
+    :param atoms: list of (row, column) tuples of atom locations
+    :return: function taking no arguments
+    """
+    game = BlackBoxGame(atoms)
+    for row, column in entry_points()[:8]:
+        game.shoot_ray(row, column)
+    game.guess_atom(2, 2)
+    return game.clone
+
+
+def _make_unmake(atoms):
+    """
+    Makes a workload that makes a shot and a guess and then undoes both, as a search does
+    when it explores a move in place
+    :param atoms: list of (row, column) tuples of atom locations
+    :return: function taking no arguments
+    """
+    game = BlackBoxGame(atoms)
+    game.start_journal()
+
+    def make_unmake():
+        game.shoot_ray(0, 5)
+        game.guess_atom(2, 2)
+        game.undo()
+        game.undo()
+    return make_unmake
+
+
+# workload name -> function building the workload, so slow setups only run when selected
+WORKLOADS = {
+    'construct/standard': lambda: lambda: BlackBoxGame([(3, 2), (1, 7), (4, 6), (8, 8)]),
+    'construct/size-200': lambda: lambda: BlackBoxGame(staircase_atoms(200), 200),
+    'trace/straight': lambda: _trace([], (0, 4)),
+    'trace/single-deflection': lambda: _trace([(3, 5)], (0, 4)),
+    'trace/edge-reflection': lambda: _trace([(1, 5)], (0, 4)),
+    'trace/hit': lambda: _trace([(5, 4)], (0, 4)),
+    'trace/zig-zag': lambda: _trace(_ZIG_ZAG_ATOMS, (0, 5)),
+    'trace/staircase-200': lambda: _trace(staircase_atoms(200), (2, 0), 200),
+    'shoot/first-shot': lambda: _shoot_first(_ZIG_ZAG_ATOMS, (0, 5)),
+    'shoot/all-entries-repeat': lambda: _shoot_repeat(_ZIG_ZAG_ATOMS),
+    'shoot/all-entries-unhooked': lambda: _shoot_repeat(_ZIG_ZAG_ATOMS, UnhookedBlackBoxGame),
+    'shoot/all-entries-instrumented': lambda: _shoot_instrumented(_ZIG_ZAG_ATOMS),
+    'guess/history-100': lambda: _guess_with_history(100),
+    'guess/history-5000': lambda: _guess_with_history(5000),
+    'game/playthrough': lambda: _playthrough([(3, 2), (1, 7), (4, 6), (8, 8)]),
+    'search/clone': lambda: _clone(_ZIG_ZAG_ATOMS),
+    'search/make-unmake': lambda: _make_unmake(_ZIG_ZAG_ATOMS),
+}
+
+
+def time_workload(workload, repeat=5, min_time=0.2):
+    """
+    Times a workload, calling it enough times per run for the run to take at least
+    min_time seconds
+    :param workload: function taking no arguments
+    :param repeat: integer number of runs
+    :param min_time: float seconds each run should take at least
+    :return: dictionary of the best and median seconds per call and the calls per run
+    """
+    timer = timeit.Timer(workload)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    per_call = [total / number for total in timer.repeat(repeat, number)]
+    return {'best': min(per_call), 'median': statistics.median(per_call), 'number': number}
+
+
+def run(names=None, repeat=5, min_time=0.2):
+    """
+    Times the selected workloads
+    :param names: list of workload names, defaults to all of them
+    :param repeat: integer number of runs of each workload
+    :param min_time: float seconds each run should take at least
+    :return: dictionary describing the machine and the results of each workload
+    """
+    results = {}
+    for name in names or WORKLOADS:
+        results[name] = time_workload(WORKLOADS[name](), repeat, min_time)
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'results': results}
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Finds the workloads whose best time got worse than the baseline by more than the
+    threshold. Best times are used because they are the least affected by other load on
+    the machine.
+    :param baseline: dictionary returned by run for the baseline
+    :param current: dictionary returned by run for the current code
+    :param threshold: float fraction of slowdown allowed
+    :return: list of (name, baseline seconds, current seconds) tuples of regressions
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is not None and result['best'] > before['best'] * (1 + threshold):
+            regressions.append((name, before['best'], result['best']))
+    return regressions
+
+
+def hook_overhead(games=7, repeat=9, min_time=0.01):
+    """
+    Finds how much slower shoot_ray is with the instrumentation hook turned off than
+    without the hook at all. Timings vary by several percent between one game object and
+    another, so the workloads are built afresh for each of several games, timed in turns
+    so both see the same load on the machine, and the median ratio of the pairs is used.
+    :param games: integer number of times each workload is built
+    :param repeat: integer number of pairs of runs on each
+    :param min_time: float seconds each run should take at least
+    :return: float fraction of slowdown
+    """
+    ratios = []
+    for _ in range(games):
+        hooked = timeit.Timer(WORKLOADS['shoot/all-entries-repeat']())
+        unhooked = timeit.Timer(WORKLOADS['shoot/all-entries-unhooked']())
+        number = 1
+        while hooked.timeit(number) < min_time:
+            number *= 2
+        for run in range(repeat):
+            if run % 2:
+                ratios.append(hooked.timeit(number) / unhooked.timeit(number))
+            else:
+                unhooked_time = unhooked.timeit(number)
+                ratios.append(hooked.timeit(number) / unhooked_time)
+    return statistics.median(ratios) - 1
+
+
+def main(argv=None):
+    """
+    Runs the suite from the command line
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Time the BlackBoxGame hot paths')
+    parser.add_argument('workloads', nargs='*',
+                        help='workloads to run, all of them by default: ' +
+                             ', '.join(WORKLOADS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--save', metavar='PATH', help='write the results to a JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='JSON baseline to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fraction of slowdown reported as a regression')
+    parser.add_argument('--hook-threshold', type=float, default=0.1,
+                        help='fraction of slowdown allowed for the instrumentation hook '
+                             'while turned off')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.workloads if name not in WORKLOADS]
+    if unknown:
+        parser.error('unknown workloads: %s' % ', '.join(unknown))
+
+    current = run(args.workloads, args.repeat, args.min_time)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    for name, result in current['results'].items():
+        line = '%-28s %12.3f us' % (name, result['best'] * 1e6)
+        if baseline is not None and name in baseline['results']:
+            line += ' %+7.1f%%' % ((result['best'] / baseline['results'][name]['best'] - 1) * 100)
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(current, results_file, indent=2)
+
+    failed = False
+    if not args.workloads or 'shoot/all-entries-unhooked' in args.workloads:
+        overhead = hook_overhead()
+        print('%-28s %+12.1f %%' % ('instrumentation hook off', overhead * 100))
+        if overhead > args.hook_threshold:
+            print('REGRESSION instrumentation hook costs %.1f%% while off' % (overhead * 100))
+            failed = True
+
+    if baseline is not None:
+        regressions = compare(baseline, current, args.threshold)
+        for name, before, after in regressions:
+            print('REGRESSION %s: %.3f us -> %.3f us' % (name, before * 1e6, after * 1e6))
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,50 +1,159 @@
 # Author: Logan Cope
 # Date:      8/5/2020
 # Description: Creates BlackBoxGame class used for playing the board
-#              game called Back Box. There is a 10x10 grid (list of
-#              lists) that represents the board. Positions of where
-#              atoms should be placed are passed into the class to
-#              initialize the board. Then a player can shoot a ray
-#              from any border square (aside from corners) which will
-#              be manipulated based on the location of the atoms on
-#              the board. A player will start with 25 points, a point
-#              will be deducted for each new entry or exit and 5 points
-#              will be deducted for a new, incorrect guess.
+#              game called Back Box. There is a square grid (list of
+#              lists, 10x10 by default) that represents the board.
+#              Positions of where atoms should be placed are passed
+#              into the class to initialize the board. Then a player
+#              can shoot a ray from any border square (aside from
+#              corners) which will be manipulated based on the
+#              location of the atoms on the board. A player will start
+#              with 25 points, a point will be deducted for each new
+#              entry or exit and 5 points will be deducted for a new,
+#              incorrect guess.
+
+from types import MappingProxyType
+
+from snapshot import pack_state, set_bits, unpack_state
+
+# For each direction a ray can travel in: the (row, column) step taken to move forward,
+# then the two diagonals ahead of the ray in the order they are checked, each paired with
+# the direction the ray is deflected into if an atom sits on that diagonal
+DEFLECTION_RULES = {
+    'right': ((0, 1), (-1, 1), 'down', (1, 1), 'up'),
+    'left': ((0, -1), (-1, -1), 'down', (1, -1), 'up'),
+    'up': ((-1, 0), (-1, 1), 'left', (-1, -1), 'right'),
+    'down': ((1, 0), (1, 1), 'left', (1, -1), 'right'),
+}
+
+
+def entry_points(size=10):
+    """
+    Builds the list of allowed entry/exit points for a board with the given number of
+    rows and columns, in the order top row, bottom row, left column, right column
+    :param size: integer representing the number of rows (and columns) of the board
+    :return: list of (row, column) tuples of every non-corner border square
+    """
+    last = size - 1
+    return ([(0, column) for column in range(1, last)] +
+            [(last, column) for column in range(1, last)] +
+            [(row, 0) for row in range(1, last)] +
+            [(row, last) for row in range(1, last)])
+
+
+def entry_point_index(row, column, size=10):
+    """
+    Returns the position of an entry/exit point in entry_points(size), worked out from
+    its row and column
+    :param row: integer representing the desired row on the game board
+    :param column: integer representing the desired column on the game board
+    :param size: integer representing the number of rows (and columns) of the board
+    :return: integer index into entry_points(size), or -1 if not an allowed entry point
+    """
+    last = size - 1
+    inner = last - 1
+    if 0 < column < last:
+        if row == 0:
+            return column - 1
+        if row == last:
+            return inner + column - 1
+    if 0 < row < last:
+        if column == 0:
+            return 2 * inner + row - 1
+        if column == last:
+            return 3 * inner + row - 1
+    return -1
+
+
+def ray_squares(entry, turning_points):
+    """
+    Fills in the straight lines between the turning points of a ray, as found by
+    BlackBoxGame.trace_ray
+    :param entry: (row, column) tuple of the entry point the ray was shot from
+    :param turning_points: list of the squares the ray turned on, then the square it
+                           stopped on
+    :return: list of (row, column) tuples of every square from the entry point to the
+             square the ray stopped on
+    """
+    path = [entry]
+    curr_row, curr_col = entry
+    for turn_row, turn_col in turning_points:
+        while curr_row != turn_row or curr_col != turn_col:
+            curr_row += (turn_row > curr_row) - (turn_row < curr_row)
+            curr_col += (turn_col > curr_col) - (turn_col < curr_col)
+            path.append((curr_row, curr_col))
+    return path
+
+
+def ray_deflections(entry, exit_point, turning_points):
+    """
+    Counts the times a ray turned, from its turning points as found by trace_ray. Every
+    turning point but the square the ray stopped on is a turn, except that the edge case
+    reflection turns back on its entry point, its only turning point, and so is counted as
+    the one deflection it is.
+    :param entry: (row, column) tuple of the entry point the ray was shot from
+    :param exit_point: what shoot_ray returns for the entry point
+    :param turning_points: list of the squares the ray turned on, then the square it
+                           stopped on
+    :return: integer number of deflections
+    """
+    deflections = len(turning_points) - 1
+    if deflections == 0 and exit_point == entry:
+        return 1
+    return deflections
 
 
 class BlackBoxGame:
     """
-    Class used for playing the board game called Back Box. There is a 10x10 grid (list of
-    lists) that represents the board. Positions of where atoms should be placed are passed
-    into class to initialize the board. Then a player can shoot a ray from any border square
-    (aside from corners) which will be travel and be manipulated based on the location of the
-    atoms on the board. A player will start with 25 points, a point will be deducted for each
-    new entry or exit and 5 points will be deducted for a new, incorrect guess.
+    Class used for playing the board game called Back Box. There is a square grid (list of
+    lists, 10x10 by default) that represents the board. Positions of where atoms should be
+    placed are passed into class to initialize the board. Then a player can shoot a ray from
+    any border square (aside from corners) which will be travel and be manipulated based on
+    the location of the atoms on the board. A player will start with 25 points, a point will
+    be deducted for each new entry or exit and 5 points will be deducted for a new, incorrect
+    guess.
     """
 
-    def __init__(self, atom_locations):
+    # object told about every ray shot in any game, see instrumentation.py. Left as None
+    # unless instrumentation is turned on, so shoot_ray only pays for one attribute check
+    _ray_observer = None
+
+    # entry point -> list of the squares its ray starts, turns and stops on, for every ray
+    # whose outcome is cached, and the straight stretches of those rays: row -> list of
+    # (first column, last column, entry point) tuples along that row, and column -> list of
+    # (first row, last row, entry point) tuples down that column. Left as None until atoms
+    # are first added or removed, so games that are only played never pay for them
+    _ray_turns = None
+    _row_segments = None
+    _column_segments = None
+
+    # True once clone has made another game that shares this game's board, atom list and
+    # ray tables, which are then copied before atoms are added or removed
+    _shared = False
+
+    # the moves made since start_journal was called that can be undone, and the moves
+    # undone that can be made again. Left as None until then, so moves only pay for one
+    # attribute check
+    _undo_moves = None
+    _redo_moves = None
+
+    def __init__(self, atom_locations, size=10):
         """
-        Initialize game board to a 10x10 list of lists. Takes a parameter of a list of
+        Initialize game board to a size x size list of lists. Takes a parameter of a list of
         (row, column) tuples for the locations of the atoms in the black box, and places
         them on the board. Initializes atoms_remaining to the number of atoms passed in the
         atoms_locations list. Initializes the score to 25. Creates a list to represent
         allowed entry points for the user to pass to the shoot_ray method. Initializes
         a list of guesses to an empty list as well as a list of used entry/exit points
-        to an empty list.
+        to an empty list. Ray outcomes are cached as rays are shot.
         :param atom_locations: list of tuples representing locations of atoms in the
                                black box
+        :param size: integer representing the number of rows (and columns) of the board,
+                     including the border squares. Defaults to 10
         """
-        self._game_board = [['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', ''],
-                            ['', '', '', '', '', '', '', '', '', '']]
-        self._atom_locations = atom_locations
+        self._size = size
+        self._game_board = [[''] * size for _ in range(size)]
+        self._atom_locations = list(atom_locations)
 
         # set atoms to specified locations
         for atom in atom_locations:
@@ -54,12 +163,13 @@ class BlackBoxGame:
         self._guesses = []
 
         # use list of tuples to represent allowed entries/exit points
-        self._allowed_entry_points = [(0, 1), (0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7), (0, 8),
-                                      (9, 1), (9, 2), (9, 3), (9, 4), (9, 5), (9, 6), (9, 7), (9, 8),
-                                      (1, 0), (2, 0), (3, 0), (4, 0), (5, 0), (6, 0), (7, 0), (8, 0),
-                                      (1, 9), (2, 9), (3, 9), (4, 9), (5, 9), (6, 9), (7, 9), (8, 9)]
+        self._allowed_entry_points = entry_points(size)
         self._entry_and_exit_points = []
 
+        # each entry's outcome is traced once and cached here, and only traced again if an
+        # atom near its path is added or removed
+        self._ray_outcomes = {}
+
     def display_board(self):
         """
         Prints out Black Box board one row at a time
@@ -67,19 +177,30 @@ class BlackBoxGame:
         for row in self._game_board:
             print(row)
 
+    def is_entry_point(self, row, column):
+        """
+        Checks whether the given row and column designate a border square that is not a
+        corner, i.e. an allowed entry/exit point
+        :param row: integer representing the desired row on the game board
+        :param column: integer representing the desired column on the game board
+        :return: boolean (True/False) representing whether this is an allowed entry point
+        """
+        last = self._size - 1
+        if row == 0 or row == last:
+            return 0 < column < last
+        if column == 0 or column == last:
+            return 0 < row < last
+        return False
+
     def shoot_ray(self, row, column):
         """
         First checks if chosen row and column designates a valid entry point, if it does
         not, then False is returned. Adds this chosen row/column to entry point array if
-        it is not already in said list and subtract from points. Then interacts with direction
-        method to determine the initial direction the ray is traveling in. Next call the
-        check_edge_case_reflection method is called to check the reflection case where a ray
-        begins directly next to an atom that is along the "edge" of the board; if this type of
-        reflection occurs just return the row and column that was passed in originally. If
-        method hasn't already returned then call travel method based on initial direction to
-        determine the exit_point. Update entry/exit list if needed, update points if needed,
-        and return the exit_point. Note: multiple returns are possible, see return section
-        below for more detail on what returns are possible based on given situations
+        it is not already in said list and subtract from points. The exit point is then
+        looked up in the ray outcome cache, tracing the ray first if it has not been shot
+        before. Update entry/exit list if needed, update points if needed, and return the
+        exit_point. Note: multiple returns are possible, see return section below for more
+        detail on what returns are possible based on given situations
 
         :param row: integer representing the desired row on the game board
         :param column: integer representing the desired column on the game board
@@ -87,8 +208,11 @@ class BlackBoxGame:
         :return: None if hit occurs
         :return: tuple (row, column) of the exit point of the ray
         """
+        if self._undo_moves is not None:
+            self._journal_move('shoot_ray', row, column)
+
         # check if row/column is an allowed entry point
-        if (row, column) not in self._allowed_entry_points:
+        if not self.is_entry_point(row, column):
             return False
 
         # add entry to entry/exit point list and deduct point if entry hasn't already been used
@@ -96,33 +220,236 @@ class BlackBoxGame:
             self._entry_and_exit_points.append((row, column))
             self._score -= 1
 
+        try:
+            exit_point = self._ray_outcomes[(row, column)]
+        except KeyError:
+            exit_point = self._cache_ray((row, column))
+
+        # If exit point was not a hit and isn't already an entry/exit point, subtract 1
+        # from the score and add exit_point to entry/exit point list
+        if exit_point is not None and exit_point not in self._entry_and_exit_points:
+            self._entry_and_exit_points.append(exit_point)
+            self._score -= 1
+
+        if self._ray_observer is not None:
+            self._ray_observer.observe_ray(self, (row, column), exit_point)
+        return exit_point
+
+    def build_ray_table(self):
+        """
+        Traces a ray from every allowed entry point that has not been traced yet in a
+        single pass, so that shoot_ray only has to look the result up. Unless atoms are
+        added or removed this only needs to happen once per game.
+        :return: dictionary mapping each entry point tuple to its exit point tuple, the
+                 entry point itself if the ray is reflected, or None if a hit occurs
+        """
+        ray_outcomes = self._ray_outcomes
+        for entry in self._allowed_entry_points:
+            if entry not in ray_outcomes:
+                self._cache_ray(entry)
+        return ray_outcomes
+
+    def ray_table(self):
+        """
+        Returns a read-only copy of the outcome of every allowed entry point, building
+        the table first if needed. Looking at this table does not affect the player's
+        score. Atoms added or removed afterwards do not change a table already returned.
+        :return: read-only mapping of entry point tuple to exit point tuple or None
+        """
+        return MappingProxyType(dict(self.build_ray_table()))
+
+    def trace_ray(self, row, column, turning_points=None):
+        """
+        Follows the path of a ray shot from an allowed entry point without touching the
+        score. Interacts with direction method to determine the initial direction the ray
+        is traveling in. Next the check_edge_case_reflection method is called to check the
+        reflection case where a ray begins directly next to an atom that is along the
+        "edge" of the board; if this type of reflection occurs just return the row and
+        column that was passed in originally. Otherwise follow the ray from the entry point
+        in its initial direction to determine the exit point.
+        :param row: integer representing the row of an allowed entry point
+        :param column: integer representing the column of an allowed entry point
+        :param turning_points: optional list that the squares the ray turns and stops on
+                               are added to, see follow_ray
+        :return: None if hit occurs
+        :return: tuple (row, column) of the exit point of the ray
+        """
         # determine which direction ray will initially be traveling
         direction = self.check_direction(row, column)
 
         # Check the reflection edge case where atom is along a border and ray is shot
         # right next to said atom
         if self.check_edge_case_reflection(row, column, direction):
+            if turning_points is not None:
+                turning_points.append((row, column))
             return (row, column)
 
-        # If we haven't hit a return statement then follow the rest of the ray's path
-        # Call the correct method based on the initial direction that the ray is traveling
-        # Exit point will hold tuple of exit point or None if a hit occurred
-        if direction == 'right':
-            exit_point = self.travel_right(row, column)
-        elif direction == 'left':
-            exit_point = self.travel_left(row, column)
-        elif direction == 'up':
-            exit_point = self.travel_up(row, column)
-        elif direction == 'down':
-            exit_point = self.travel_down(row, column)
+        return self.follow_ray(row, column, direction, turning_points)
 
-        # If exit point was not a hit and isn't already an entry/exit point, subtract 1
-        # from the score and add exit_point to entry/exit point list
-        if exit_point is not None and exit_point not in self._entry_and_exit_points:
-            self._entry_and_exit_points.append(exit_point)
-            self._score -= 1
+    def ray_path(self, row, column):
+        """
+        Traces the ray shot from an allowed entry point, without touching the score, and
+        lists every square it passes through
+        :param row: integer representing the row of an allowed entry point
+        :param column: integer representing the column of an allowed entry point
+        :return: tuple of (exit point as returned by trace_ray, list of (row, column)
+                 tuples of the squares from the entry point to the square the ray stopped
+                 on)
+        """
+        turning_points = []
+        exit_point = self.trace_ray(row, column, turning_points)
+        return exit_point, ray_squares((row, column), turning_points)
+
+    def add_atom(self, row, column):
+        """
+        Places a new atom on an empty square inside the border, for editing a layout. Only
+        the cached ray outcomes whose paths pass next to the square are forgotten, to be
+        traced again when next needed. A wrong guess already made on the square is
+        forgotten, so the new atom can still be found, although the points it cost are not
+        given back. Moves made before cannot be undone afterwards.
+        :param row: integer representing the row of the new atom
+        :param column: integer representing the column of the new atom
+        :return: boolean (True/False) representing whether the atom was added
+        """
+        last = self._size - 1
+        if not (0 < row < last and 0 < column < last) or self._game_board[row][column] == 'A':
+            return False
+        self._unshare()
+        self._index_rays()
+        self._game_board[row][column] = 'A'
+        self._atom_locations.append((row, column))
+        self._atoms_remaining += 1
+        if (row, column) in self._guesses:
+            self._guesses.remove((row, column))
+        self._forget_near(row, column)
+        return True
+
+    def remove_atom(self, row, column):
+        """
+        Takes an atom off the board, for editing a layout. Only the cached ray outcomes
+        whose paths pass next to the square are forgotten, to be traced again when next
+        needed. If the atom had already been found, the correct guess is forgotten instead
+        of the atoms remaining going down. Moves made before cannot be undone afterwards.
+        :param row: integer representing the row of the atom
+        :param column: integer representing the column of the atom
+        :return: boolean (True/False) representing whether an atom was removed
+        """
+        if (row, column) not in self._atom_locations:
+            return False
+        self._unshare()
+        self._index_rays()
+        self._game_board[row][column] = ''
+        self._atom_locations.remove((row, column))
+        if (row, column) in self._guesses:
+            self._guesses.remove((row, column))
+        else:
+            self._atoms_remaining -= 1
+        self._forget_near(row, column)
+        return True
+
+    def _unshare(self):
+        """
+        Before atoms are added or removed: gives this game its own copy of the board, atom
+        list and ray outcomes if they are shared with a clone (dropping the ray index, which
+        is rebuilt when needed), and empties the move journal, since the moves in it may no
+        longer be undone correctly
+        """
+        if self._shared:
+            self._game_board = [board_row[:] for board_row in self._game_board]
+            self._atom_locations = self._atom_locations[:]
+            self._ray_outcomes = dict(self._ray_outcomes)
+            self._ray_turns = None
+            self._row_segments = None
+            self._column_segments = None
+            self._shared = False
+        if self._undo_moves is not None:
+            self._undo_moves.clear()
+            self._redo_moves.clear()
+
+    def _cache_ray(self, entry):
+        """
+        Traces one ray and caches its outcome, indexing its path if atoms have been added
+        or removed
+        :param entry: (row, column) tuple of an allowed entry point
+        :return: the ray's outcome, as returned by trace_ray
+        """
+        if self._ray_turns is not None:
+            return self._index_ray(entry)
+        exit_point = self._ray_outcomes[entry] = self.trace_ray(entry[0], entry[1])
         return exit_point
 
+    def _index_rays(self):
+        """
+        Traces every ray whose outcome is cached again, recording the straight stretches it
+        passes along, unless this has been done already
+        """
+        if self._ray_turns is not None:
+            return
+        self._ray_turns = {}
+        self._row_segments = {}
+        self._column_segments = {}
+        for entry in list(self._ray_outcomes):
+            self._index_ray(entry)
+
+    def _index_ray(self, entry):
+        """
+        Traces one ray, caching its outcome and adding each straight stretch of its path to
+        the segments of the row or column it runs along
+        :param entry: (row, column) tuple of an allowed entry point
+        :return: the ray's outcome, as returned by trace_ray
+        """
+        turning_points = []
+        exit_point = self._ray_outcomes[entry] = self.trace_ray(entry[0], entry[1],
+                                                                turning_points)
+        self._ray_turns[entry] = [entry] + turning_points
+        for segments, segment in self._ray_segments(entry):
+            segments.append(segment)
+        return exit_point
+
+    def _ray_segments(self, entry):
+        """
+        Lists the straight stretches of an indexed ray. A ray that stops where it starts,
+        like the edge case reflection, is a stretch of a single square.
+        :param entry: (row, column) tuple of an indexed entry point
+        :return: generator of (segment list of the row or column, (first, last, entry)
+                 tuple) tuples
+        """
+        turns = self._ray_turns[entry]
+        for (start_row, start_col), (end_row, end_col) in zip(turns, turns[1:]):
+            if start_row == end_row:
+                yield (self._row_segments.setdefault(start_row, []),
+                       (min(start_col, end_col), max(start_col, end_col), entry))
+            else:
+                yield (self._column_segments.setdefault(start_col, []),
+                       (min(start_row, end_row), max(start_row, end_row), entry))
+
+    def _forget_near(self, row, column):
+        """
+        Forgets the cached outcome of every ray whose path passes through the 3x3 block of
+        squares centred on the given square, found from the segments of the three rows and
+        three columns through the block. A ray only ever looks at the squares next to the
+        ones it passes through, so no other ray can be changed by an atom added to or
+        removed from it.
+        :param row: integer representing the row of the changed square
+        :param column: integer representing the column of the changed square
+        :return: set of the (row, column) tuples of the entry points forgotten
+        """
+        affected = set()
+        for line in range(row - 1, row + 2):
+            for first, last, entry in self._row_segments.get(line, ()):
+                if first <= column + 1 and last >= column - 1:
+                    affected.add(entry)
+        for line in range(column - 1, column + 2):
+            for first, last, entry in self._column_segments.get(line, ()):
+                if first <= row + 1 and last >= row - 1:
+                    affected.add(entry)
+        for entry in affected:
+            for segments, segment in self._ray_segments(entry):
+                segments.remove(segment)
+            del self._ray_turns[entry]
+            del self._ray_outcomes[entry]
+        return affected
+
     def check_direction(self, row, column):
         """
         Determines the initial direction that the ray is traveling and returns this to the
@@ -131,187 +458,127 @@ class BlackBoxGame:
         :param column: integer representing the desired column on the game board
         :return: string representing the initial direction array is traveling
         """
+        last = self._size - 1
         if row == 0:
             return 'down'
-        elif row == 9:
+        elif row == last:
             return 'up'
         elif column == 0:
             return 'right'
-        elif column == 9:
+        elif column == last:
             return 'left'
 
-    def travel_right(self, row, column):
+    def follow_ray(self, row, column, direction, turning_points=None):
         """
-        Method can be called by shoot_ray if ray is initially traveling in this direction
-        or by any other traveling method if a deflection send the ray in this direction.
-        This will travel to the right on the board until either a hit occurs, the ray
-        reaches the right border, or a deflection sends the ray in a different direction.
-        In which case this method will call the method of the direction the ray begins
-        traveling in. Note: multiple returns are possible, see return section below
-        for more detail on what returns will occur based on given situations
+        Moves a ray across the board from the given position until either a hit occurs or
+        the ray reaches a border square. On each step the square directly ahead is checked
+        for a hit, then the two diagonals ahead are checked (in the order given by
+        DEFLECTION_RULES) for a deflection, which turns the ray without moving it. If none
+        of these hold the ray moves forward one square. The border is only checked once the
+        ray has moved since its last turn, so the starting square is never an exit. This is
+        a single loop, so long zig-zag paths on large boards cannot exhaust the call stack.
+        A ray that is turned four times without moving is boxed in by atoms and would spin
+        forever, so it is treated as a reflection back out of the starting square.
+        Note: multiple returns are possible, see return section below for more detail
 
-        :param row: Represents the row the ray was on when this method was called
-        :param column: Represents the column the ray was on when this method was called
+        :param row: Represents the row the ray starts on
+        :param column: Represents the column the ray starts on
+        :param direction: string representing the direction the ray starts traveling in
+        :param turning_points: optional list that the square of every deflection, and then
+                               the square the ray stops on, are added to. The ray travels
+                               in straight lines between them, so this is enough to
+                               rebuild its whole path. Only looked at when the ray turns
+                               or stops, so tracing costs the same when it is not given
         :return: None if hit occurs
         :return: tuple representing exit point of the array
         """
-        # initialize position to current row and column
+        board = self._game_board
+        last = self._size - 1
         curr_row = row
         curr_col = column
-        count = 0  # this will be used to determine if we are on the first iteration of while loop
+        (step_row, step_col), first_diagonal, first_turn, second_diagonal, second_turn = \
+            DEFLECTION_RULES[direction]
+        moved = False  # the border is only an exit once the ray has moved since its last turn
+        turns = 0  # number of deflections since the ray last moved
 
         # we will just continue this loop until we hit a return statement
         while True:
-            # if at border, but not on first passed row/column return exit point tuple
-            if (curr_row, curr_col) in self._allowed_entry_points and count != 0:
+            # if at border, but not on the square the ray started or turned on, return exit
+            if moved and (curr_row == 0 or curr_row == last or curr_col == 0 or curr_col == last):
+                if turning_points is not None:
+                    turning_points.append((curr_row, curr_col))
                 return (curr_row, curr_col)
 
             # peek at next position, if it causes a hit, return None
-            elif self._game_board[curr_row][curr_col + 1] == 'A':
+            if board[curr_row + step_row][curr_col + step_col] == 'A':
+                if turning_points is not None:
+                    turning_points.append((curr_row, curr_col))
                 return None
 
-            # look diagonally right and up to see if a deflection occurs, go down if so
-            elif self._game_board[curr_row - 1][curr_col + 1] == 'A':
-                return self.travel_down(curr_row, curr_col)
-
-            # look diagonally right and down to see if a deflection occurs, go up if so
-            elif self._game_board[curr_row + 1][curr_col + 1] == 'A':
-                return self.travel_up(curr_row, curr_col)
+            # look at the diagonals ahead to see if a deflection occurs, turn if so
+            if board[curr_row + first_diagonal[0]][curr_col + first_diagonal[1]] == 'A':
+                direction = first_turn
+            elif board[curr_row + second_diagonal[0]][curr_col + second_diagonal[1]] == 'A':
+                direction = second_turn
 
-            # otherwise, move ray to the right on board
+            # otherwise, move ray forward on board
             else:
-                curr_col += 1
-            count += 1  # increment count so we know we are not on the first iteration
+                curr_row += step_row
+                curr_col += step_col
+                moved = True
+                turns = 0
+                continue
+
+            if turning_points is not None:
+                turning_points.append((curr_row, curr_col))
+            turns += 1
+            if turns == 4:
+                if turning_points is not None:
+                    turning_points.append((curr_row, curr_col))
+                return (row, column)
+            (step_row, step_col), first_diagonal, first_turn, second_diagonal, second_turn = \
+                DEFLECTION_RULES[direction]
+            moved = False
 
-    def travel_left(self, row, column):
+    def travel_right(self, row, column):
         """
-        Method can be called by shoot_ray if ray is initially traveling in this direction
-        or by any other traveling method if a deflection send the ray in this direction.
-        This will travel to the left on the board until either a hit occurs, the ray
-        reaches the left border, or a deflection sends the ray in a different direction.
-        In which case this method will call the method of the direction the ray begins
-        traveling in. Note: multiple returns are possible, see return section below
-        for more detail on what returns will occur based on given situations
-
+        Follows a ray traveling to the right from the given position, see follow_ray
         :param row: Represents the row the ray was on when this method was called
         :param column: Represents the column the ray was on when this method was called
         :return: None if hit occurs
         :return: tuple representing exit point of the array
         """
-        # initialize position to current row and column
-        curr_row = row
-        curr_col = column
-        count = 0  # this will be used to determine if we are on the first iteration of while loop
-
-        # we will just continue this loop until we hit a return statement
-        while True:
-            # if at border, but not on first passed row/column return exit point tuple
-            if (curr_row, curr_col) in self._allowed_entry_points and count != 0:
-                return (curr_row, curr_col)
-
-            # peek at next position, if it causes a hit, return None
-            elif self._game_board[curr_row][curr_col - 1] == 'A':
-                return None
-
-            # look diagonally left and up to see if a deflection occurs, go down if so
-            elif self._game_board[curr_row - 1][curr_col - 1] == 'A':
-                return self.travel_down(curr_row, curr_col)
+        return self.follow_ray(row, column, 'right')
 
-            # look diagonally left and up to see if a deflection occurs, go up if so
-            elif self._game_board[curr_row + 1][curr_col - 1] == 'A':
-                return self.travel_up(curr_row, curr_col)
-
-            # otherwise, move ray to the left on board
-            else:
-                curr_col -= 1
-            count += 1  # increment count so we know we are not on the first iteration
+    def travel_left(self, row, column):
+        """
+        Follows a ray traveling to the left from the given position, see follow_ray
+        :param row: Represents the row the ray was on when this method was called
+        :param column: Represents the column the ray was on when this method was called
+        :return: None if hit occurs
+        :return: tuple representing exit point of the array
+        """
+        return self.follow_ray(row, column, 'left')
 
     def travel_up(self, row, column):
         """
-        Method can be called by shoot_ray if ray is initially traveling in this direction
-        or by any other traveling method if a deflection send the ray in this direction.
-        This will travel up on the board until either a hit occurs, the ray reaches the
-        top border, or a deflection sends the ray in a different direction. In which case
-        this method will call the method of the direction the ray begins traveling in.
-        Note: multiple returns are possible, see return section below for more detail
-        on what returns will occur based on given situations
-
+        Follows a ray traveling up from the given position, see follow_ray
         :param row: Represents the row the ray was on when this method was called
         :param column: Represents the column the ray was on when this method was called
         :return: None if hit occurs
         :return: tuple representing exit point of the array
         """
-        # initialize position to current row and column
-        curr_row = row
-        curr_col = column
-        count = 0  # this will be used to determine if we are on the first iteration of while loop
-
-        # we will just continue this loop until we hit a return statement
-        while True:
-            # if at border, but not on first passed row/column return exit point tuple
-            if (curr_row, curr_col) in self._allowed_entry_points and count != 0:
-                return (curr_row, curr_col)
-
-            # peek at next position, if it causes a hit, return None
-            elif self._game_board[curr_row - 1][curr_col] == 'A':
-                return None
-
-            # look diagonally right and up to see if a deflection occurs, go left if so
-            elif self._game_board[curr_row - 1][curr_col + 1] == 'A':
-                return self.travel_left(curr_row, curr_col)
-
-            # look diagonally left and up to see if a deflection occurs, go right if so
-            elif self._game_board[curr_row - 1][curr_col - 1] == 'A':
-                return self.travel_right(curr_row, curr_col)
-
-            # otherwise, move ray up on board
-            else:
-                curr_row -= 1
-            count += 1  # increment count so we know we are not on the first iteration
+        return self.follow_ray(row, column, 'up')
 
     def travel_down(self, row, column):
         """
-        Method can be called by shoot_ray if ray is initially traveling in this direction
-        or by any other traveling method if a deflection send the ray in this direction.
-        This will travel down on the board until either a hit occurs, the ray reaches the
-        lower border, or a deflection sends the ray in a different direction. In which case
-        this method will call the method of the direction the ray begins traveling in.
-        Note: multiple returns are possible, see return section below for more detail
-        on what returns will occur based on given situations
-
+        Follows a ray traveling down from the given position, see follow_ray
         :param row: Represents the row the ray was on when this method was called
         :param column: Represents the column the ray was on when this method was called
         :return: None if hit occurs
         :return: tuple representing exit point of the array
         """
-        # initialize position to current row and column
-        curr_row = row
-        curr_col = column
-
-        count = 0  # this will be used to determine if we are on the first iteration of while loop
-
-        # we will just continue this loop until we hit a return statement
-        while True:
-            # if at border, but not on first passed row/column return exit point tuple
-            if (curr_row, curr_col) in self._allowed_entry_points and count != 0:
-                return (curr_row, curr_col)
-
-            # peek at next position, if it causes a hit, return None
-            elif self._game_board[curr_row + 1][curr_col] == 'A':
-                return None
-
-            # look diagonally right and down to see if a deflection occurs, go left if so
-            elif self._game_board[curr_row + 1][curr_col + 1] == 'A':
-                return self.travel_left(curr_row, curr_col)
-
-            # look diagonally left and down to see if a deflection occurs, go right if so
-            elif self._game_board[curr_row + 1][curr_col - 1] == 'A':
-                return self.travel_right(curr_row, curr_col)
-
-            # otherwise, move ray down on board
-            else:
-                curr_row += 1
-            count += 1  # increment count so we know we are not on the first iteration
+        return self.follow_ray(row, column, 'down')
 
     def check_edge_case_reflection(self, row, column, direction):
         """
@@ -360,11 +627,20 @@ class BlackBoxGame:
         atoms_left and guess is added. Either way if guess is correct True is returned.
         If guess is incorrect, if guess hasn't already been guessed, 5 will be subtracted
         from the user's score and guess will be added to the guess list. False will be
-        returned
+        returned. A square off the board is not a guess at all: False is returned and
+        nothing is charged or recorded, so the guess list only holds squares a snapshot
+        can keep.
         :param row: integer representing row of user's guess
         :param column: nteger representing column of user's guess
         :return: boolean (True/False) representing whether user's guess is correct
         """
+        if self._undo_moves is not None:
+            self._journal_move('guess_atom', row, column)
+
+        # squares off the board can never hold an atom
+        if not (0 <= row < self._size and 0 <= column < self._size):
+            return False
+
         # If guess is correct and hasn't already been guessed, subtract 1 from atoms_left
         # and add guess to guesses list
         if (row, column) in self._atom_locations:
@@ -380,6 +656,94 @@ class BlackBoxGame:
             self._guesses.append((row, column))
         return False
 
+    def clone(self):
+        """
+        Makes a copy of the game that can be played on separately, for searching through
+        moves. The board, atom list, entry points and ray outcomes are shared rather than
+        copied, since playing does not change them (adding or removing atoms copies them
+        first), so only the score, guesses and used entry/exit points are copied. If this
+        game keeps a move journal the copy starts with an empty one.
+        :return: BlackBoxGame
+        """
+        game = object.__new__(type(self))
+        game.__dict__.update(self.__dict__)
+        game._guesses = self._guesses[:]
+        game._entry_and_exit_points = self._entry_and_exit_points[:]
+        if self._undo_moves is not None:
+            game._undo_moves = []
+            game._redo_moves = []
+        self._shared = game._shared = True
+        return game
+
+    def start_journal(self):
+        """
+        Starts keeping a journal of the shoot_ray and guess_atom calls made from now on, so
+        that they can be unmade with undo and made again with redo. Each call, including
+        ones that change nothing, is one entry in the journal.
+        """
+        if self._undo_moves is None:
+            self._undo_moves = []
+            self._redo_moves = []
+
+    def _journal_move(self, move, row, column):
+        """
+        Records a move about to be made, together with what is needed to unmake it. Moves
+        only ever add to the end of the guesses and used entry/exit points, so their lengths
+        are enough to undo them. A new move means the undone moves can no longer be redone.
+        :param move: string name of the method making the move
+        :param row: integer row passed to the method
+        :param column: integer column passed to the method
+        """
+        self._undo_moves.append((move, row, column, len(self._entry_and_exit_points),
+                                 len(self._guesses), self._score, self._atoms_remaining))
+        if self._redo_moves:
+            self._redo_moves.clear()
+
+    def undo(self):
+        """
+        Unmakes the last move in the journal, see start_journal
+        :return: boolean (True/False) representing whether there was a move to undo
+        """
+        if not self._undo_moves:
+            return False
+        move, row, column, used_points, guesses, self._score, self._atoms_remaining = \
+            self._undo_moves.pop()
+        del self._entry_and_exit_points[used_points:]
+        del self._guesses[guesses:]
+        self._redo_moves.append((move, row, column))
+        return True
+
+    def redo(self):
+        """
+        Makes the last undone move again, see start_journal
+        :return: boolean (True/False) representing whether there was a move to redo
+        """
+        if not self._redo_moves:
+            return False
+        move, row, column = self._redo_moves.pop()
+
+        # keep the rest of the undone moves, which making a move would otherwise forget
+        redo_moves = self._redo_moves
+        self._redo_moves = []
+        getattr(self, move)(row, column)
+        self._redo_moves = redo_moves
+        return True
+
+    def get_size(self):
+        """
+        Returns the number of rows (and columns) of the board, including the border
+        :return: integer board size
+        """
+        return self._size
+
+    def get_used_points(self):
+        """
+        Returns the entry/exit points that have already been charged for, in the order they
+        were used
+        :return: list of (row, column) tuples
+        """
+        return list(self._entry_and_exit_points)
+
     def get_score(self):
         """
         Returns the player's current score
@@ -393,3 +757,40 @@ class BlackBoxGame:
         :return: integer of remaining atoms left to be guessed
         """
         return self._atoms_remaining
+
+    def to_bytes(self):
+        """
+        Encodes the state of the game as a fixed-width snapshot (see snapshot.py), which
+        holds everything that affects play. The order guesses and entry/exit points were
+        made in is not kept, nor is the move journal.
+        :return: bytes of length snapshot.snapshot_length(size)
+        """
+        size = self._size
+        atoms = 0
+        for row, column in self._atom_locations:
+            atoms |= 1 << (row * size + column)
+        guesses = 0
+        for row, column in self._guesses:
+            guesses |= 1 << (row * size + column)
+        used_points = 0
+        for row, column in self._entry_and_exit_points:
+            used_points |= 1 << entry_point_index(row, column, size)
+        return pack_state(size, self._score, self._atoms_remaining, atoms, guesses, used_points)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuilds a game from a snapshot made by to_bytes. The guesses and used entry/exit
+        points come back in board order, which only decides the order they are looked
+        through in.
+        :param data: bytes-like object holding the snapshot
+        :return: BlackBoxGame
+        """
+        size, score, atoms_remaining, atoms, guesses, used_points = unpack_state(data)
+        game = cls([divmod(cell, size) for cell in set_bits(atoms)], size)
+        game._score = score
+        game._atoms_remaining = atoms_remaining
+        game._guesses = [divmod(cell, size) for cell in set_bits(guesses)]
+        game._entry_and_exit_points = [game._allowed_entry_points[index]
+                                       for index in set_bits(used_points)]
+        return game
@@ -0,0 +1,343 @@
+# Description: Creates CompactBlackBoxGame class, a memory-light version
+#              of BlackBoxGame with its playing methods. Instead of
+#              a list of lists board and lists of tuples, the atoms,
+#              guesses and used entry/exit points of a game are each
+#              stored as a single integer bitmask, and the border
+#              tables for a board size are shared between every game
+#              of that size. Intended for holding very many small games
+#              at once; rays are traced on demand rather than cached.
+#              The layout editing, search and path methods of
+#              BlackBoxGame (add_atom, remove_atom, clone,
+#              start_journal, undo, redo, ray_path and build_ray_table)
+#              are not provided.
+
+from types import MappingProxyType
+
+from black_box import DEFLECTION_RULES, entry_point_index, entry_points
+from snapshot import pack_state, unpack_state
+
+
+class BoardTables:
+    """
+    Static per-size tables shared by every CompactBlackBoxGame of that size. Cells are
+    numbered row * size + column and entry/exit points are numbered in the order given
+    by black_box.entry_points, which is the bit position used for them in a game's mask
+    of used entry/exit points.
+    """
+
+    __slots__ = ('size', 'entry_points', 'deflections')
+
+    # one instance per board size, created the first time a game of that size is made
+    _by_size = {}
+
+    def __init__(self, size):
+        """
+        Builds the tables for a board with the given number of rows and columns
+        :param size: integer representing the number of rows (and columns) of the board
+        """
+        self.size = size
+        self.entry_points = tuple(entry_points(size))
+
+        # DEFLECTION_RULES with every (row, column) offset turned into a cell offset
+        self.deflections = {}
+        for direction, rule in DEFLECTION_RULES.items():
+            step, first_diagonal, first_turn, second_diagonal, second_turn = rule
+            self.deflections[direction] = (step[0], step[1], step[0] * size + step[1],
+                                           first_diagonal[0] * size + first_diagonal[1],
+                                           first_turn,
+                                           second_diagonal[0] * size + second_diagonal[1],
+                                           second_turn)
+
+    @classmethod
+    def for_size(cls, size):
+        """
+        Returns the shared tables for the given board size, building them if needed
+        :param size: integer representing the number of rows (and columns) of the board
+        :return: BoardTables for that size
+        """
+        tables = cls._by_size.get(size)
+        if tables is None:
+            tables = cls._by_size[size] = cls(size)
+        return tables
+
+
+class CompactBlackBoxGame:
+    """
+    Bitmask version of BlackBoxGame with the same rules and scoring. Each game only holds
+    its score, the number of atoms remaining and three integers: bit row * size + column
+    of _atoms (or _guesses) is set if that square holds an atom (or has been guessed), and
+    bit i of _used_points is set if entry/exit point i has already been charged for. Only
+    the playing methods of BlackBoxGame are provided, not its layout editing, clone, move
+    journal, ray_path or build_ray_table.
+    """
+
+    __slots__ = ('_tables', '_atoms', '_atoms_remaining', '_score', '_guesses',
+                 '_used_points')
+
+    # object told about every ray shot in any game, see instrumentation.py. Left as None
+    # unless instrumentation is turned on, so shoot_ray only pays for one attribute check
+    _ray_observer = None
+
+    def __init__(self, atom_locations, size=10):
+        """
+        Sets the bits of the given atom locations in the atom mask. Initializes
+        atoms_remaining to the number of atoms passed in the atom_locations list and the
+        score to 25, with no guesses and no used entry/exit points.
+        :param atom_locations: list of tuples representing locations of atoms in the
+                               black box
+        :param size: integer representing the number of rows (and columns) of the board,
+                     including the border squares. Defaults to 10
+        """
+        tables = BoardTables._by_size.get(size)
+        if tables is None:
+            tables = BoardTables.for_size(size)
+        self._tables = tables
+        # or-ing each bit into an integer copies the whole integer every time, which only
+        # matters once the mask is many machine words long, so the bits of large boards
+        # are set in a byte array and converted once
+        if size <= 64:
+            atoms = 0
+            for row, column in atom_locations:
+                atoms |= 1 << row * size + column
+            self._atoms = atoms
+        else:
+            atoms = bytearray((size * size + 7) // 8)
+            for row, column in atom_locations:
+                cell = row * size + column
+                atoms[cell >> 3] |= 1 << (cell & 7)
+            self._atoms = int.from_bytes(atoms, 'little')
+        self._atoms_remaining = len(atom_locations)
+        self._score = 25
+        self._guesses = 0
+        self._used_points = 0
+
+    def display_board(self):
+        """
+        Prints out Black Box board one row at a time
+        """
+        size = self._tables.size
+        atoms = self._atoms
+        for row in range(size):
+            print(['A' if atoms >> (row * size + column) & 1 else '' for column in range(size)])
+
+    def is_entry_point(self, row, column):
+        """
+        Checks whether the given row and column designate an allowed entry/exit point
+        :param row: integer representing the desired row on the game board
+        :param column: integer representing the desired column on the game board
+        :return: boolean (True/False) representing whether this is an allowed entry point
+        """
+        return entry_point_index(row, column, self._tables.size) != -1
+
+    def shoot_ray(self, row, column):
+        """
+        Returns False if the chosen row and column are not an allowed entry point.
+        Otherwise traces the ray, deducts a point for each of its entry and exit points
+        that has not been used before, and returns the exit point.
+        :param row: integer representing the desired row on the game board
+        :param column: integer representing the desired column on the game board
+        :return: bool of False if chosed row and column are not valid entries
+        :return: None if hit occurs
+        :return: tuple (row, column) of the exit point of the ray
+        """
+        tables = self._tables
+        entry_index = entry_point_index(row, column, tables.size)
+        if entry_index == -1:
+            return False
+
+        # deduct a point for the entry point if it hasn't already been used
+        used_points = self._used_points
+        if not used_points >> entry_index & 1:
+            used_points |= 1 << entry_index
+            self._score -= 1
+
+        exit_point = self.trace_ray(row, column)
+
+        # deduct a point for the exit point if it wasn't a hit and hasn't already been used
+        if exit_point is not None:
+            exit_index = entry_point_index(exit_point[0], exit_point[1], tables.size)
+            if not used_points >> exit_index & 1:
+                used_points |= 1 << exit_index
+                self._score -= 1
+        self._used_points = used_points
+
+        if self._ray_observer is not None:
+            self._ray_observer.observe_ray(self, (row, column), exit_point)
+        return exit_point
+
+    def trace_ray(self, row, column, turning_points=None):
+        """
+        Follows the path of a ray shot from an allowed entry point without touching the
+        score, using the same rules as BlackBoxGame.follow_ray. A ray that is deflected
+        before leaving its entry point is the edge case reflection, and the entry point is
+        returned.
+        :param row: integer representing the row of an allowed entry point
+        :param column: integer representing the column of an allowed entry point
+        :param turning_points: optional list that the squares the ray turns and stops on
+                               are added to, the same as BlackBoxGame.trace_ray adds
+        :return: None if hit occurs
+        :return: tuple (row, column) of the exit point of the ray
+        """
+        tables = self._tables
+        atoms = self._atoms
+        size = tables.size
+        last = size - 1
+
+        # initial direction is away from the border the ray enters through
+        if row == 0:
+            direction = 'down'
+        elif row == last:
+            direction = 'up'
+        elif column == 0:
+            direction = 'right'
+        else:
+            direction = 'left'
+
+        deflections = tables.deflections
+        step_row, step_col, step, first_diagonal, first_turn, second_diagonal, second_turn = \
+            deflections[direction]
+        curr_row = row
+        curr_col = column
+        cell = row * size + column
+        moved = False
+        turns = 0
+        while True:
+            # if at border, but not on the square the ray started or turned on, return exit
+            if moved and (curr_row == 0 or curr_row == last or curr_col == 0 or curr_col == last):
+                if turning_points is not None:
+                    turning_points.append((curr_row, curr_col))
+                return (curr_row, curr_col)
+
+            # peek at next position, if it causes a hit, return None
+            if atoms >> (cell + step) & 1:
+                if turning_points is not None:
+                    turning_points.append((curr_row, curr_col))
+                return None
+
+            # look at the diagonals ahead to see if a deflection occurs, turn if so
+            if atoms >> (cell + first_diagonal) & 1:
+                direction = first_turn
+            elif atoms >> (cell + second_diagonal) & 1:
+                direction = second_turn
+
+            # otherwise, move ray forward on board
+            else:
+                curr_row += step_row
+                curr_col += step_col
+                cell += step
+                moved = True
+                turns = 0
+                continue
+
+            # deflected before ever leaving the entry point, or boxed in by atoms
+            if curr_row == row and curr_col == column:
+                if turning_points is not None:
+                    turning_points.append((row, column))
+                return (row, column)
+            if turning_points is not None:
+                turning_points.append((curr_row, curr_col))
+            if turns == 3:
+                if turning_points is not None:
+                    turning_points.append((curr_row, curr_col))
+                return (row, column)
+            turns += 1
+            step_row, step_col, step, first_diagonal, first_turn, second_diagonal, second_turn = \
+                deflections[direction]
+            moved = False
+
+    def ray_table(self):
+        """
+        Returns a read-only view of the outcome of every allowed entry point. Looking at
+        this table does not affect the player's score.
+        :return: read-only mapping of entry point tuple to exit point tuple or None
+        """
+        return MappingProxyType({entry: self.trace_ray(entry[0], entry[1])
+                                 for entry in self._tables.entry_points})
+
+    def guess_atom(self, row, column):
+        """
+        If guess is correct and hasn't already been guessed, 1 is subtracted from the
+        atoms_left and the guess bit is set. Either way if guess is correct True is
+        returned. If guess is incorrect, if guess hasn't already been guessed, 5 will be
+        subtracted from the user's score and the guess will be recorded. False will be
+        returned. A square off the board is not a guess at all: False is returned and
+        nothing is charged or recorded.
+        :param row: integer representing row of user's guess
+        :param column: integer representing column of user's guess
+        :return: boolean (True/False) representing whether user's guess is correct
+        """
+        size = self._tables.size
+
+        # squares off the board can never hold an atom and have no bit of their own
+        if not (0 <= row < size and 0 <= column < size):
+            return False
+
+        bit = 1 << (row * size + column)
+        if self._atoms & bit:
+            if not self._guesses & bit and self._atoms_remaining != 0:
+                self._atoms_remaining -= 1
+                self._guesses |= bit
+            return True
+
+        # If location has not already been guessed, subtract 5 and record the guess
+        if not self._guesses & bit:
+            self._score -= 5
+            self._guesses |= bit
+        return False
+
+    def get_size(self):
+        """
+        Returns the number of rows (and columns) of the board, including the border
+        :return: integer board size
+        """
+        return self._tables.size
+
+    def get_used_points(self):
+        """
+        Returns the entry/exit points that have already been charged for, in the order of
+        black_box.entry_points, since the bitmask does not keep the order they were used in
+        :return: list of (row, column) tuples
+        """
+        used_points = self._used_points
+        return [point for index, point in enumerate(self._tables.entry_points)
+                if used_points >> index & 1]
+
+    def get_score(self):
+        """
+        Returns the player's current score
+        :return: integer of the player's current score
+        """
+        return self._score
+
+    def atoms_left(self):
+        """
+        Returns the remaining atoms not yet correctly guessed
+        :return: integer of remaining atoms left to be guessed
+        """
+        return self._atoms_remaining
+
+    def to_bytes(self):
+        """
+        Encodes the state of the game as a fixed-width snapshot (see snapshot.py), which
+        holds everything that affects play
+        :return: bytes of length snapshot.snapshot_length(size)
+        """
+        return pack_state(self._tables.size, self._score, self._atoms_remaining, self._atoms,
+                          self._guesses, self._used_points)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Rebuilds a game from a snapshot made by to_bytes
+        :param data: bytes-like object holding the snapshot
+        :return: CompactBlackBoxGame
+        """
+        size, score, atoms_remaining, atoms, guesses, used_points = unpack_state(data)
+        game = cls.__new__(cls)
+        game._tables = BoardTables.for_size(size)
+        game._atoms = atoms
+        game._atoms_remaining = atoms_remaining
+        game._score = score
+        game._guesses = guesses
+        game._used_points = used_points
+        return game
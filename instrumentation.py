@@ -0,0 +1,218 @@
+# Description: Optional recording of what the rays shot in BlackBoxGame
+#              and CompactBlackBoxGame games do. While turned on, every
+#              ray shot is traced again with its turning points
+#              recorded, and a RayRecord with its full path, step and
+#              deflection counts and outcome is added to running
+#              counters and histograms and passed to each sink. Sinks
+#              can be a callback, an in-memory ring buffer or a JSON
+#              lines file. While turned off, the only cost to shoot_ray
+#              is checking that no observer is set.
+#
+#              Usage:
+#                  recorder = RayInstrumentation([RingBufferSink(1000)])
+#                  enable(recorder)
+#                  ... play games ...
+#                  disable()
+#                  print(recorder.stats.summary())
+
+import json
+from collections import Counter, deque
+
+from black_box import BlackBoxGame, ray_deflections, ray_squares
+from compact_black_box import CompactBlackBoxGame
+
+
+class RayRecord:
+    """
+    What happened to one ray. kind is 'hit', 'reflection' (the ray came back out of its
+    entry point) or 'exit'. path lists every square the ray passed through, from the entry
+    point to the square it stopped on, steps is the number of moves it made and
+    deflections the number of times it turned.
+    """
+
+    __slots__ = ('entry', 'exit_point', 'kind', 'path', 'steps', 'deflections')
+
+    def __init__(self, entry, exit_point, turning_points):
+        """
+        Builds the record from the turning points found by trace_ray of either game class
+        :param entry: (row, column) tuple of the entry point
+        :param exit_point: what shoot_ray returned for the entry point
+        :param turning_points: list of the squares the ray turned on, then the square it
+                               stopped on
+        """
+        self.entry = entry
+        self.exit_point = exit_point
+        if exit_point is None:
+            self.kind = 'hit'
+        elif exit_point == entry:
+            self.kind = 'reflection'
+        else:
+            self.kind = 'exit'
+
+        self.path = ray_squares(entry, turning_points)
+        self.steps = len(self.path) - 1
+        self.deflections = ray_deflections(entry, exit_point, turning_points)
+
+    def as_dict(self):
+        """
+        Returns the record as a dictionary of JSON types
+        :return: dictionary of field name to value
+        """
+        return {
+            'entry': list(self.entry),
+            'exit': list(self.exit_point) if self.exit_point is not None else None,
+            'kind': self.kind,
+            'steps': self.steps,
+            'deflections': self.deflections,
+            'path': [list(square) for square in self.path],
+        }
+
+
+class RayStats:
+    """
+    Running counters and histograms over every recorded ray
+    """
+
+    def __init__(self):
+        """
+        Starts with nothing counted
+        """
+        self.rays = 0
+        self.kinds = Counter()
+        self.steps = Counter()  # number of steps -> number of rays
+        self.deflections = Counter()  # number of deflections -> number of rays
+
+    def add(self, record):
+        """
+        Counts one ray
+        :param record: RayRecord of the ray
+        """
+        self.rays += 1
+        self.kinds[record.kind] += 1
+        self.steps[record.steps] += 1
+        self.deflections[record.deflections] += 1
+
+    def summary(self):
+        """
+        Returns the counters and histograms as a dictionary of JSON types
+        :return: dictionary of statistic name to value
+        """
+        rays = max(self.rays, 1)
+        return {
+            'rays': self.rays,
+            'kinds': dict(self.kinds),
+            'mean_steps': sum(steps * count for steps, count in self.steps.items()) / rays,
+            'max_steps': max(self.steps, default=0),
+            'mean_deflections': sum(deflections * count
+                                    for deflections, count in self.deflections.items()) / rays,
+            'steps_histogram': dict(sorted(self.steps.items())),
+            'deflections_histogram': dict(sorted(self.deflections.items())),
+        }
+
+
+class CallbackSink:
+    """
+    Sink that calls a function with each RayRecord
+    """
+
+    def __init__(self, callback):
+        """
+        :param callback: function taking a RayRecord
+        """
+        self.callback = callback
+
+    def write(self, record):
+        """
+        Passes a record to the callback
+        :param record: RayRecord
+        """
+        self.callback(record)
+
+
+class RingBufferSink:
+    """
+    Sink that keeps only the most recent RayRecords in memory
+    """
+
+    def __init__(self, capacity=1000):
+        """
+        :param capacity: integer number of records to keep
+        """
+        self.records = deque(maxlen=capacity)
+
+    def write(self, record):
+        """
+        Keeps a record, dropping the oldest if the buffer is full
+        :param record: RayRecord
+        """
+        self.records.append(record)
+
+
+class JsonLinesSink:
+    """
+    Sink that writes each RayRecord to a file as one line of JSON
+    """
+
+    def __init__(self, path):
+        """
+        :param path: file name to append the records to
+        """
+        self._file = open(path, 'a')
+
+    def write(self, record):
+        """
+        Writes a record to the file
+        :param record: RayRecord
+        """
+        self._file.write(json.dumps(record.as_dict()) + '\n')
+
+    def close(self):
+        """
+        Closes the file
+        """
+        self._file.close()
+
+
+class RayInstrumentation:
+    """
+    Observer set on both game classes by enable, which records every ray shot
+    """
+
+    def __init__(self, sinks=()):
+        """
+        :param sinks: list of sinks (objects with a write method taking a RayRecord)
+        """
+        self.sinks = list(sinks)
+        self.stats = RayStats()
+
+    def observe_ray(self, game, entry, exit_point):
+        """
+        Called by shoot_ray of either game class after each ray is shot. Traces the ray
+        again to find its path, then counts it and passes it on to the sinks.
+        :param game: BlackBoxGame or CompactBlackBoxGame the ray was shot in
+        :param entry: (row, column) tuple of the entry point
+        :param exit_point: what shoot_ray returned
+        """
+        turning_points = []
+        game.trace_ray(entry[0], entry[1], turning_points)
+        record = RayRecord(entry, exit_point, turning_points)
+        self.stats.add(record)
+        for sink in self.sinks:
+            sink.write(record)
+
+
+def enable(observer):
+    """
+    Starts recording every ray shot in every BlackBoxGame and CompactBlackBoxGame
+    :param observer: RayInstrumentation (or any object with an observe_ray method)
+    """
+    BlackBoxGame._ray_observer = observer
+    CompactBlackBoxGame._ray_observer = observer
+
+
+def disable():
+    """
+    Stops recording rays
+    """
+    BlackBoxGame._ray_observer = None
+    CompactBlackBoxGame._ray_observer = None
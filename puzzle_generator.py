@@ -0,0 +1,248 @@
+# Description: Generates Black Box puzzles: an atom layout together with a
+#              small set of entry points whose shoot_ray results are only
+#              given by that layout, so a player who shoots exactly those
+#              rays can always work out where every atom is. Layouts are
+#              drawn at random from a SignatureTable, whose signatures
+#              hold the outcome of every entry point on every layout, so
+#              checking a layout never traces the other layouts again.
+#              Entry points are chosen greedily, each one ruling out as
+#              many of the remaining candidate layouts as possible, then
+#              any that turn out to be unneeded are dropped. Puzzles can
+#              be asked for at a difficulty, given by the number of rays
+#              needed and the number of them deflected more than once.
+#              Run from the repository root with
+#                  python puzzle_generator.py 4 --count 1000 --difficulty hard
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from batch_trace import outcome_to_exit
+from black_box import BlackBoxGame, ray_deflections
+from solver import SignatureTable
+
+# difficulty name -> (fewest rays, most rays, fewest rays deflected more than once)
+DIFFICULTIES = {
+    'easy': (1, 3, 0),
+    'medium': (4, 4, 0),
+    'hard': (5, 32, 1),
+}
+
+
+class Puzzle:
+    """
+    One generated puzzle. entries are the entry points to shoot, in the order they were
+    chosen, and exits what shoot_ray returns for each of them. deflections holds the
+    number of times each of those rays turns.
+    """
+
+    __slots__ = ('atoms', 'entries', 'exits', 'deflections')
+
+    def __init__(self, atoms, entries, exits, deflections):
+        """
+        :param atoms: list of (row, column) tuples of atom locations
+        :param entries: list of (row, column) tuples of the entry points to shoot
+        :param exits: list of what shoot_ray returns for each entry point
+        :param deflections: list of integer number of turns made by each ray
+        """
+        self.atoms = atoms
+        self.entries = entries
+        self.exits = exits
+        self.deflections = deflections
+
+    def rays(self):
+        """
+        Returns the number of rays needed to solve the puzzle
+        :return: integer number of entry points
+        """
+        return len(self.entries)
+
+    def multi_deflections(self):
+        """
+        Returns the number of the puzzle's rays that are deflected more than once
+        :return: integer number of rays
+        """
+        return sum(1 for turns in self.deflections if turns > 1)
+
+    def as_dict(self):
+        """
+        Returns the puzzle as a dictionary of JSON types
+        :return: dictionary of field name to value
+        """
+        return {
+            'atoms': [list(atom) for atom in self.atoms],
+            'entries': [list(entry) for entry in self.entries],
+            'exits': [list(exit_point) if exit_point is not None else None
+                      for exit_point in self.exits],
+            'deflections': self.deflections,
+        }
+
+
+class PuzzleGenerator:
+    """
+    Makes puzzles from the layouts of a SignatureTable. The number of layouts giving each
+    outcome of each entry point is counted once, so choosing the first entry point of a
+    puzzle needs no pass over the table, and each later choice only looks at the layouts
+    that the earlier ones have not ruled out.
+    """
+
+    def __init__(self, table, seed=None):
+        """
+        :param table: SignatureTable of the board size and number of atoms to generate
+        :param seed: optional seed of the random layout choices
+        """
+        self._table = table
+        self._signatures = table.build()
+        self._random = random.Random(seed)
+
+        # the outcomes of each entry point on every layout, stored contiguously, since
+        # reading a column of the signatures array touches a cache line per layout
+        self._columns = np.ascontiguousarray(self._signatures.T)
+
+        # _outcome_counts[port, outcome + 2] is the number of layouts giving that outcome
+        ports = len(table.entries)
+        self._outcome_counts = np.zeros((ports, ports + 2), dtype=np.int64)
+        for port in range(ports):
+            self._outcome_counts[port] = np.bincount(self._columns[port].astype(np.int64) + 2,
+                                                     minlength=ports + 2)
+
+    def choose_entries(self, index):
+        """
+        Finds a set of entry points whose outcomes only layout index of the table gives,
+        none of which can be left out
+        :param index: integer index of the layout in the table
+        :return: list of integer entry point numbers in the order chosen, or None if every
+                 entry point together still cannot tell the layout apart from another
+        """
+        signatures = self._signatures
+        columns = self._columns
+        signature = signatures[index]
+        ports = len(signature)
+
+        # greedily choose the entry point that leaves the fewest candidates, the first from
+        # the outcome counts alone
+        remaining = self._outcome_counts[np.arange(ports), signature.astype(np.int64) + 2]
+        chosen = [int(np.argmin(remaining))]
+        first = np.flatnonzero(columns[chosen[0]] == signature[chosen[0]])
+        candidates = first
+        while len(candidates) > 1:
+            agree = signatures[candidates] == signature
+            agree[:, chosen] = True
+            remaining = np.count_nonzero(agree, axis=0)
+            remaining[chosen] = len(candidates) + 1
+            port = int(np.argmin(remaining))
+            if remaining[port] == len(candidates):
+                return None
+            chosen.append(port)
+            candidates = candidates[agree[:, port]]
+
+        # drop the later entry points that are not needed, latest first. Every layout that
+        # could stop one being dropped agrees on the first, which is kept for now.
+        needed = np.ones(len(chosen), dtype=bool)
+        differs = signatures[first[first != index]][:, chosen] != signature[chosen]
+        for position in reversed(range(1, len(chosen))):
+            needed[position] = False
+            if not differs[:, needed].any(axis=1).all():
+                needed[position] = True
+        chosen = [port for port, keep in zip(chosen, needed) if keep]
+
+        # then the first, if no other layout agrees on all the rest
+        if len(chosen) > 1:
+            agree = columns[chosen[1]] == signature[chosen[1]]
+            for port in chosen[2:]:
+                agree &= columns[port] == signature[port]
+            agree[index] = False
+            if not agree.any():
+                chosen = chosen[1:]
+        return chosen
+
+    def puzzle(self, index):
+        """
+        Makes the puzzle of one layout
+        :param index: integer index of the layout in the table
+        :return: Puzzle, or None if the layout cannot be told apart from another
+        """
+        chosen = self.choose_entries(index)
+        if chosen is None:
+            return None
+        table = self._table
+        atoms = table.layout_atoms(index)
+        game = BlackBoxGame(atoms, table.size)
+        entries = [table.entries[port] for port in chosen]
+        exits = [outcome_to_exit(int(self._signatures[index, port]), table.entries[port],
+                                 table.size) for port in chosen]
+        deflections = []
+        for entry, exit_point in zip(entries, exits):
+            turning_points = []
+            game.trace_ray(entry[0], entry[1], turning_points)
+            deflections.append(ray_deflections(entry, exit_point, turning_points))
+        return Puzzle(atoms, entries, exits, deflections)
+
+    def generate(self, count, difficulty=None, max_attempts=None):
+        """
+        Makes puzzles from layouts chosen at random, skipping layouts whose puzzle does not
+        have the given difficulty
+        :param count: integer number of puzzles to make
+        :param difficulty: optional name from DIFFICULTIES, or a (fewest rays, most rays,
+                           fewest rays deflected more than once) tuple
+        :param max_attempts: optional integer number of layouts to try before giving up,
+                             defaults to 1000 times count
+        :return: generator of Puzzle
+        """
+        if isinstance(difficulty, str):
+            difficulty = DIFFICULTIES[difficulty]
+        if max_attempts is None:
+            max_attempts = 1000 * count
+        layouts = len(self._table.layouts)
+        made = 0
+        for _ in range(max_attempts):
+            if made == count:
+                return
+            puzzle = self.puzzle(self._random.randrange(layouts))
+            if puzzle is None:
+                continue
+            if difficulty is not None:
+                fewest, most, multi = difficulty
+                if not fewest <= puzzle.rays() <= most or puzzle.multi_deflections() < multi:
+                    continue
+            made += 1
+            yield puzzle
+
+
+def main(argv=None):
+    """
+    Generates puzzles from the command line, writing one JSON object per line
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Generate Black Box puzzles')
+    parser.add_argument('atoms', type=int, help='number of atoms in each puzzle')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--difficulty', choices=sorted(DIFFICULTIES))
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--table', metavar='PATH',
+                        help='.npz signature table to use, built and saved there if missing')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    table = SignatureTable.load_or_build(args.table, args.atoms, args.size)
+    if table.atom_count != args.atoms or table.size != args.size:
+        parser.error('the table is of %d atoms on a %dx%d board'
+                     % (table.atom_count, table.size, table.size))
+
+    generator = PuzzleGenerator(table, args.seed)
+    start = time.perf_counter()
+    made = 0
+    for puzzle in generator.generate(args.count, args.difficulty):
+        print(json.dumps(puzzle.as_dict()))
+        made += 1
+    elapsed = time.perf_counter() - start
+    print('%d puzzles in %.1f s (%.0f per minute)' % (made, elapsed, made / elapsed * 60),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
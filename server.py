@@ -0,0 +1,394 @@
+# Description: Serves Black Box games to many players at once from a
+#              single asyncio event loop. Clients send one JSON object
+#              per line and get one JSON object per line back. A session
+#              holds one game and outlives the connection that created
+#              it, until it is closed or has been idle for too long.
+#              Each connection handles one request at a time and waits
+#              for its reply to be sent before reading the next, so a
+#              client that stops reading stops being served. Also
+#              includes a load generator that reports latency
+#              percentiles and requests per second.
+#
+#              Requests (the optional "id" is echoed back in the reply):
+#                {"op": "new", "atoms": [[3, 2], [1, 7]], "size": 10}
+#                {"op": "new", "atoms": 4}   (random atom locations)
+#                {"op": "shoot_ray", "session": "...", "row": 3, "column": 9}
+#                {"op": "guess_atom", "session": "...", "row": 5, "column": 5}
+#                {"op": "get_score", "session": "..."}
+#                {"op": "atoms_left", "session": "..."}
+#                {"op": "close", "session": "..."}
+#              Rows and columns must be on the board (0 to size - 1).
+#              Boards are at most max_size squares across and hold at
+#              most max_atoms atoms, on distinct squares.
+#              Replies are {"ok": true, "result": ...} or
+#              {"ok": false, "error": "..."}.
+
+import argparse
+import asyncio
+import json
+import random
+import secrets
+import time
+from collections import OrderedDict
+
+from compact_black_box import CompactBlackBoxGame
+from black_box import entry_points
+
+
+class GameServer:
+    """
+    Holds the sessions of every connected player and answers their requests. Sessions are
+    kept in least recently used order, so evicting idle sessions only has to look at the
+    oldest ones.
+    """
+
+    def __init__(self, idle_timeout=600.0, max_sessions=100000, max_line=4096,
+                 sweep_interval=5.0, max_size=200, max_atoms=1000):
+        """
+        :param idle_timeout: float seconds a session may go unused before it is evicted
+        :param max_sessions: integer number of sessions allowed at once
+        :param max_line: integer length in bytes of the longest request accepted
+        :param sweep_interval: float seconds between checks for idle sessions
+        :param max_size: integer number of rows (and columns) of the largest board allowed,
+                         since every request is answered on the one event loop
+        :param max_atoms: integer number of atoms allowed in one game
+        """
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_line = max_line
+        self.sweep_interval = sweep_interval
+        self.max_size = max_size
+        self.max_atoms = max_atoms
+        self._sessions = OrderedDict()  # session id -> [game, time last used]
+        self._server = None
+        self._sweeper = None
+
+    def session_count(self):
+        """
+        Returns the number of open sessions
+        :return: integer number of sessions
+        """
+        return len(self._sessions)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Starts listening for connections and evicting idle sessions
+        :param host: string address to listen on
+        :param port: integer port to listen on, 0 picks a free one
+        :return: integer port being listened on
+        """
+        self._server = await asyncio.start_server(self._serve_connection, host, port,
+                                                  limit=self.max_line)
+        self._sweeper = asyncio.create_task(self._sweep_idle_sessions())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        Stops listening and evicting sessions
+        """
+        self._sweeper.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def evict_idle_sessions(self, now=None):
+        """
+        Closes every session that has not been used for longer than idle_timeout
+        :param now: float time.monotonic() value to compare against, defaults to now
+        :return: integer number of sessions evicted
+        """
+        if now is None:
+            now = time.monotonic()
+        sessions = self._sessions
+        evicted = 0
+        while sessions:
+            session_id, (_, last_used) = next(iter(sessions.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del sessions[session_id]
+            evicted += 1
+        return evicted
+
+    async def _sweep_idle_sessions(self):
+        """
+        Evicts idle sessions every sweep_interval seconds until cancelled
+        """
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.evict_idle_sessions()
+
+    async def _serve_connection(self, reader, writer):
+        """
+        Answers the requests sent on one connection until it is closed, or sends a line
+        longer than max_line
+        :param reader: asyncio.StreamReader of the connection
+        :param writer: asyncio.StreamWriter of the connection
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                writer.write(self.handle_line(line))
+
+                # wait until the reply has been taken by the client before reading more
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def handle_line(self, line):
+        """
+        Answers one request
+        :param line: bytes of one JSON request
+        :return: bytes of the JSON reply, ending in a newline
+        """
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+            reply = {'ok': True, 'result': self.handle_request(request)}
+        except (ValueError, TypeError) as error:
+            reply = {'ok': False, 'error': str(error)}
+        except RecursionError:
+            # deeply nested JSON, which a line well under max_line can hold
+            reply = {'ok': False, 'error': 'request nested too deeply'}
+        if isinstance(request, dict) and 'id' in request:
+            reply['id'] = request['id']
+        return json.dumps(reply).encode() + b'\n'
+
+    def handle_request(self, request):
+        """
+        Carries out one decoded request, raising ValueError if it is not valid
+        :param request: dictionary of the request
+        :return: the value to send back as the result
+        """
+        op = request.get('op')
+        if op == 'new':
+            return self.new_session(request.get('atoms', 4), request.get('size', 10))
+
+        session_id = request.get('session')
+        session = self._sessions.get(session_id) if isinstance(session_id, str) else None
+        if session is None:
+            raise ValueError('no session %r' % (session_id,))
+        session[1] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        game = session[0]
+
+        if op == 'shoot_ray':
+            exit_point = game.shoot_ray(*_square(request, game.get_size()))
+            return list(exit_point) if isinstance(exit_point, tuple) else exit_point
+        elif op == 'guess_atom':
+            return game.guess_atom(*_square(request, game.get_size()))
+        elif op == 'get_score':
+            return game.get_score()
+        elif op == 'atoms_left':
+            return game.atoms_left()
+        elif op == 'close':
+            del self._sessions[session_id]
+            return True
+        raise ValueError('unknown op %r' % (op,))
+
+    def new_session(self, atoms, size):
+        """
+        Starts a new game
+        :param atoms: list of [row, column] atom locations, or the number of atoms to place
+                      at random
+        :param size: integer number of rows (and columns) of the board
+        :return: string id of the new session
+        """
+        if len(self._sessions) >= self.max_sessions:
+            raise ValueError('too many sessions')
+        if not _is_integer(size) or not 3 <= size <= self.max_size:
+            raise ValueError('size must be an integer from 3 to %d' % (self.max_size,))
+        interior = range(1, size - 1)
+        if _is_integer(atoms):
+            if not 0 <= atoms <= min(self.max_atoms, (size - 2) ** 2):
+                raise ValueError('atoms must be from 0 to %d'
+                                 % (min(self.max_atoms, (size - 2) ** 2),))
+            cells = random.sample(range((size - 2) ** 2), atoms)
+            atom_locations = [(1 + cell // (size - 2), 1 + cell % (size - 2)) for cell in cells]
+        else:
+            if not isinstance(atoms, list) or len(atoms) > self.max_atoms:
+                raise ValueError('atoms must be a list of at most %d squares'
+                                 % (self.max_atoms,))
+            atom_locations = [(row, column) for row, column in atoms]
+            if not all(_is_integer(row) and _is_integer(column) and
+                       row in interior and column in interior for row, column in atom_locations):
+                raise ValueError('atoms must be inside the border')
+
+            # a game with two atoms on one square could never be finished
+            if len(set(atom_locations)) != len(atom_locations):
+                raise ValueError('atoms must be on distinct squares')
+        session_id = secrets.token_hex(8)
+        self._sessions[session_id] = [CompactBlackBoxGame(atom_locations, size), time.monotonic()]
+        return session_id
+
+
+def _is_integer(value):
+    """
+    Checks whether a decoded JSON value is an integer, which true and false are not
+    :param value: value to check
+    :return: boolean (True/False) representing whether value is an integer
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _integer(request, key):
+    """
+    Returns an integer field of a request, raising ValueError if it is not one
+    :param request: dictionary of the request
+    :param key: string name of the field
+    :return: integer value of the field
+    """
+    value = request.get(key)
+    if not _is_integer(value):
+        raise ValueError('%s must be an integer' % (key,))
+    return value
+
+
+def _square(request, size):
+    """
+    Returns the row and column of a request, raising ValueError if they are not on the
+    board. Off-board squares are turned away here because every distinct wrong guess is
+    remembered by the game, so they would let a client grow a session without limit.
+    :param request: dictionary of the request
+    :param size: integer number of rows (and columns) of the session's board
+    :return: tuple of (row, column)
+    """
+    row = _integer(request, 'row')
+    column = _integer(request, 'column')
+    if not (0 <= row < size and 0 <= column < size):
+        raise ValueError('row and column must be from 0 to %d' % (size - 1,))
+    return row, column
+
+
+async def _load_connection(host, port, requests, latencies, rng):
+    """
+    Opens one connection and session and sends requests one at a time, recording the time
+    each takes to be answered
+    :param host: string address of the server
+    :param port: integer port of the server
+    :param requests: integer number of game requests to send
+    :param latencies: list that the latency of each request in seconds is added to
+    :param rng: random.Random to choose moves with
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def send(request):
+        start = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        reply = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - start)
+        return reply
+
+    session_id = (await send({'op': 'new', 'atoms': 4}))['result']
+    entries = entry_points()
+    for _ in range(requests):
+        choice = rng.random()
+        if choice < 0.6:
+            row, column = rng.choice(entries)
+            await send({'op': 'shoot_ray', 'session': session_id, 'row': row, 'column': column})
+        elif choice < 0.8:
+            await send({'op': 'guess_atom', 'session': session_id,
+                        'row': rng.randint(1, 8), 'column': rng.randint(1, 8)})
+        elif choice < 0.9:
+            await send({'op': 'get_score', 'session': session_id})
+        else:
+            await send({'op': 'atoms_left', 'session': session_id})
+    await send({'op': 'close', 'session': session_id})
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load_test(host, port, connections=100, requests=100, seed=0):
+    """
+    Runs many client connections at once against a server
+    :param host: string address of the server
+    :param port: integer port of the server
+    :param connections: integer number of connections open at once
+    :param requests: integer number of game requests sent on each connection
+    :param seed: integer seed used to choose the moves
+    :return: dictionary with the number of requests, requests per second and the p50 and
+             p99 latencies in milliseconds
+    """
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_connection(host, port, requests, latencies,
+                                            random.Random('%d:%d' % (seed, connection)))
+                           for connection in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+async def _serve_forever(args):
+    """
+    Runs a server until interrupted
+    :param args: parsed command line arguments
+    """
+    server = GameServer(args.idle_timeout, args.max_sessions, max_size=args.max_size,
+                        max_atoms=args.max_atoms)
+    port = await server.start(args.host, args.port)
+    print('serving on %s:%d' % (args.host, port))
+    await asyncio.Event().wait()
+
+
+async def _run_load_test(args):
+    """
+    Runs the load generator, against a server started in the same event loop if --local
+    was given
+    :param args: parsed command line arguments
+    """
+    server = None
+    port = args.port
+    if args.local:
+        server = GameServer()
+        port = await server.start(args.host, 0)
+    print(await load_test(args.host, port, args.connections, args.requests, args.seed))
+    if server is not None:
+        await server.stop()
+
+
+def main(argv=None):
+    """
+    Runs the server or the load generator from the command line
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Black Box game server')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help='run the server')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--idle-timeout', type=float, default=600.0)
+    serve.add_argument('--max-sessions', type=int, default=100000)
+    serve.add_argument('--max-size', type=int, default=200)
+    serve.add_argument('--max-atoms', type=int, default=1000)
+    load = commands.add_parser('loadgen', help='run the load generator')
+    load.add_argument('--host', default='127.0.0.1')
+    load.add_argument('--port', type=int, default=8765)
+    load.add_argument('--local', action='store_true',
+                      help='start a server in the same process to test against')
+    load.add_argument('--connections', type=int, default=100)
+    load.add_argument('--requests', type=int, default=100)
+    load.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(_serve_forever(args) if args.command == 'serve' else _run_load_test(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+# Description: Finds atom layouts that can never be told apart, because
+#              every entry point gives the same outcome on them. The
+#              outcomes of every entry point on a layout are its
+#              signature. The board looks the same after any of its 8
+#              rotations and reflections, so only one layout from each
+#              set of symmetric layouts is traced, and each signature is
+#              stored in the form that is smallest over the 8 symmetries
+#              (its canonical form) together with the layouts that have
+#              it. The work is split by the first atom of each layout
+#              over a process pool, and the index is written as a number
+#              of sorted shard files, each holding the signatures whose
+#              hash falls in that shard, so no step needs the whole
+#              index in memory. Run from the repository root with
+#                  python signature_index.py 4 index_dir
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+
+import numpy as np
+
+from batch_trace import trace_rays
+from black_box import entry_points
+
+# one record of the index: the canonical signature as four words (see _signature_words),
+# then the layout as a mask with bit (row - 1) * (size - 2) + (column - 1) set for each atom
+RECORD = np.dtype([('s0', '<u8'), ('s1', '<u8'), ('s2', '<u8'), ('s3', '<u8'),
+                   ('layout', '<u8')])
+_SIGNATURE_FIELDS = ['s0', 's1', 's2', 's3']
+
+# number of layouts traced at once, which bounds the memory used by each worker
+_CHUNK = 32768
+
+
+def symmetries(size=10):
+    """
+    Returns the 8 rotations and reflections of a board, each as a function of a square
+    :param size: integer number of rows (and columns) of the board
+    :return: list of functions taking (row, column) and returning the (row, column) it moves
+             to, the identity first
+    """
+    last = size - 1
+    return [lambda row, column: (row, column),
+            lambda row, column: (column, last - row),
+            lambda row, column: (last - row, last - column),
+            lambda row, column: (last - column, row),
+            lambda row, column: (row, last - column),
+            lambda row, column: (last - row, column),
+            lambda row, column: (column, row),
+            lambda row, column: (last - column, last - row)]
+
+
+class BoardSymmetry:
+    """
+    The symmetries of a board as index arrays: where each interior square and each entry
+    point moves to, and the inverse of each symmetry
+    """
+
+    def __init__(self, size=10):
+        """
+        :param size: integer number of rows (and columns) of the board, at most 10 so the
+                     interior fits in a 64 bit mask
+        """
+        inner = size - 2
+        if inner * inner > 64:
+            raise ValueError('the interior of a %dx%d board does not fit in 64 bits'
+                             % (size, size))
+        self.size = size
+        self.entries = entry_points(size)
+        port_of = {entry: index for index, entry in enumerate(self.entries)}
+        self.maps = symmetries(size)
+
+        # squares[g, i] is where interior square i moves to under symmetry g, and ports[g, p]
+        # is where entry point p moves to
+        self.squares = np.array([[(row - 1) * inner + column - 1
+                                  for row, column in (transform(1 + i // inner, 1 + i % inner)
+                                                      for i in range(inner * inner))]
+                                 for transform in self.maps], dtype=np.int64)
+        self.ports = np.array([[port_of[transform(row, column)] for row, column in self.entries]
+                               for transform in self.maps], dtype=np.int64)
+        self.inverse = [next(h for h in range(8)
+                             if (self.squares[h][self.squares[g]] == np.arange(inner * inner)).all())
+                        for g in range(8)]
+        self.bits = np.left_shift(np.uint64(1), np.arange(inner * inner, dtype=np.uint64))
+
+    def masks(self, squares):
+        """
+        Returns the masks of layouts after every symmetry
+        :param squares: array of shape (layouts, atoms) of interior square numbers
+        :return: uint64 array of shape (8, layouts)
+        """
+        return np.bitwise_or.reduce(self.bits[self.squares[:, squares]], axis=2)
+
+    def move_mask(self, mask, symmetry):
+        """
+        Returns the mask of one layout after a symmetry
+        :param mask: integer layout mask
+        :param symmetry: integer index of the symmetry
+        :return: integer layout mask
+        """
+        moved = 0
+        for square in range(len(self.bits)):
+            if mask >> square & 1:
+                moved |= 1 << int(self.squares[symmetry, square])
+        return moved
+
+    def move_signatures(self, signatures, symmetry):
+        """
+        Returns the signatures the given layouts would have after a symmetry is applied to
+        them, i.e. with the entry points and exit points moved by the symmetry
+        :param signatures: array of shape (layouts, entry points) of outcomes
+        :param symmetry: integer index of the symmetry
+        :return: array of the same shape
+        """
+        ports = self.ports[symmetry]
+        moved = np.empty_like(signatures)
+        moved[:, ports] = np.where(signatures >= 0, ports[np.maximum(signatures, 0)], signatures)
+        return moved
+
+    def layout_atoms(self, mask):
+        """
+        Returns the atom locations of a layout mask
+        :param mask: integer layout mask
+        :return: list of (row, column) tuples
+        """
+        inner = self.size - 2
+        return [(1 + square // inner, 1 + square % inner) for square in range(len(self.bits))
+                if int(mask) >> square & 1]
+
+
+def _signature_words(signatures):
+    """
+    Packs signatures into four 64 bit words each, reading each group of 8 outcomes as a
+    big-endian number, so comparing the words in order compares the signatures outcome by
+    outcome
+    :param signatures: int8 array of shape (layouts, entry points) of outcomes, at most 32
+                       entry points
+    :return: uint64 array of shape (layouts, 4)
+    """
+    packed = np.zeros((len(signatures), 32), dtype=np.uint8)
+    packed[:, :signatures.shape[1]] = signatures.astype(np.int16) + 2
+    return packed.view('>u8').astype(np.uint64)
+
+
+def _lexically_less(left, right):
+    """
+    Compares rows of words lexicographically
+    :param left: uint64 array of shape (layouts, words)
+    :param right: uint64 array of shape (layouts, words)
+    :return: boolean array, True where the row of left comes before the row of right
+    """
+    less = np.zeros(len(left), dtype=bool)
+    equal = np.ones(len(left), dtype=bool)
+    for word in range(left.shape[1]):
+        less |= equal & (left[:, word] < right[:, word])
+        equal &= left[:, word] == right[:, word]
+    return less
+
+
+def index_records(squares, symmetry):
+    """
+    Builds the index records of some layouts that are each the smallest mask among their
+    symmetric layouts. The signature of each layout is traced once and moved by every
+    symmetry; each symmetry that gives the smallest (canonical) signature contributes the
+    moved layout, which has exactly that signature.
+    :param squares: array of shape (layouts, atoms) of interior square numbers
+    :param symmetry: BoardSymmetry of the board
+    :return: array of RECORD
+    """
+    size = symmetry.size
+    inner = size - 2
+    cells = (1 + squares // inner) * size + 1 + squares % inner
+    signatures = trace_rays(cells, symmetry.entries, size).astype(np.int8)
+    masks = symmetry.masks(squares)
+
+    words = [_signature_words(symmetry.move_signatures(signatures, g)) for g in range(8)]
+    smallest = words[0]
+    for g in range(1, 8):
+        smallest = np.where(_lexically_less(words[g], smallest)[:, None], words[g], smallest)
+
+    records = []
+    for g in range(8):
+        chosen = (words[g] == smallest).all(axis=1)
+        chunk = np.empty(int(chosen.sum()), dtype=RECORD)
+        for word, field in enumerate(_SIGNATURE_FIELDS):
+            chunk[field] = smallest[chosen, word]
+        chunk['layout'] = masks[g, chosen]
+        records.append(chunk)
+    return np.unique(np.concatenate(records))
+
+
+def _canonical_layouts(first, atom_count, symmetry):
+    """
+    Lists the layouts whose lowest atom is on the given interior square and whose mask is
+    the smallest among their symmetric layouts, a chunk at a time
+    :param first: integer interior square number of the lowest atom
+    :param atom_count: integer number of atoms in each layout
+    :param symmetry: BoardSymmetry of the board
+    :return: generator of arrays of shape (layouts, atom_count) of interior square numbers
+    """
+    square_count = len(symmetry.bits)
+    layouts = ((first,) + rest
+               for rest in itertools.combinations(range(first + 1, square_count), atom_count - 1))
+    while True:
+        squares = np.fromiter(itertools.chain.from_iterable(itertools.islice(layouts, _CHUNK)),
+                              dtype=np.int64).reshape(-1, atom_count)
+        if not len(squares):
+            return
+        masks = symmetry.masks(squares)
+        yield squares[masks[0] == masks.min(axis=0)]
+
+
+def _index_first_square(job):
+    """
+    Builds the records of every canonical layout whose lowest atom is on one square. Runs
+    in a worker process.
+    :param job: tuple of (interior square number, atom count, board size)
+    :return: tuple of (number of canonical layouts, array of RECORD)
+    """
+    first, atom_count, size = job
+    symmetry = BoardSymmetry(size)
+    canonical = 0
+    records = [np.empty(0, dtype=RECORD)]
+    for squares in _canonical_layouts(first, atom_count, symmetry):
+        canonical += len(squares)
+        if len(squares):
+            records.append(index_records(squares, symmetry))
+    return canonical, np.concatenate(records)
+
+
+def _shard_of(records, shards):
+    """
+    Returns the shard each record belongs in, from a hash of its signature
+    :param records: array of RECORD
+    :param shards: integer number of shards
+    :return: array of shard numbers
+    """
+    mixed = (records['s0'] ^ (records['s1'] * np.uint64(0x9E3779B97F4A7C15)) ^
+             (records['s2'] * np.uint64(0xC2B2AE3D27D4EB4F)) ^
+             (records['s3'] * np.uint64(0x165667B19E3779F9)))
+    return (mixed % np.uint64(shards)).astype(np.int64)
+
+
+def _finish_shard(job):
+    """
+    Sorts one shard by signature, writes it as an .npy file and finds its ambiguity
+    classes. Runs in a worker process.
+    :param job: tuple of (directory, shard number)
+    :return: list of ambiguity classes, each a list of layout masks that share a signature
+    """
+    directory, shard = job
+    raw_path = os.path.join(directory, 'shard-%03d.raw' % shard)
+    records = np.unique(np.fromfile(raw_path, dtype=RECORD))
+    np.save(os.path.join(directory, 'shard-%03d.npy' % shard), records)
+    os.remove(raw_path)
+
+    classes = []
+    if len(records):
+        words = np.column_stack([records[field] for field in _SIGNATURE_FIELDS])
+        starts = np.flatnonzero(np.concatenate(([True], (words[1:] != words[:-1]).any(axis=1))))
+        sizes = np.diff(np.append(starts, len(records)))
+        for start, count in zip(starts[sizes > 1], sizes[sizes > 1]):
+            classes.append([int(mask) for mask in records['layout'][start:start + count]])
+    return classes
+
+
+def build_index(atom_count, directory, size=10, shards=64, workers=None):
+    """
+    Builds the signature index of every layout of the given number of atoms, writing it to
+    a directory as shard-NNN.npy files, an ambiguous.jsonl file listing every ambiguity
+    class (layouts that share a signature, one class per line, one class for each set of
+    symmetric classes) and an index.json summary
+    :param atom_count: integer number of atoms in each layout
+    :param directory: directory to write to, created if needed
+    :param size: integer number of rows (and columns) of the board
+    :param shards: integer number of shard files
+    :param workers: integer number of processes, defaults to the number of CPUs
+    :return: dictionary of the summary written to index.json
+    """
+    os.makedirs(directory, exist_ok=True)
+    symmetry = BoardSymmetry(size)
+    square_count = len(symmetry.bits)
+    raw_files = [open(os.path.join(directory, 'shard-%03d.raw' % shard), 'wb')
+                 for shard in range(shards)]
+    canonical = 0
+    jobs = [(first, atom_count, size) for first in range(square_count - atom_count + 1)]
+    with multiprocessing.Pool(workers) as pool:
+        for layouts, records in pool.imap_unordered(_index_first_square, jobs):
+            canonical += layouts
+            shard_numbers = _shard_of(records, shards)
+            for shard in np.unique(shard_numbers):
+                records[shard_numbers == shard].tofile(raw_files[shard])
+        for raw_file in raw_files:
+            raw_file.close()
+
+        ambiguous_layouts = 0
+        classes = 0
+        with open(os.path.join(directory, 'ambiguous.jsonl'), 'w') as ambiguous_file:
+            for shard_classes in pool.imap_unordered(
+                    _finish_shard, [(directory, shard) for shard in range(shards)]):
+                for layout_class in shard_classes:
+                    classes += 1
+                    ambiguous_layouts += len(layout_class)
+                    ambiguous_file.write(json.dumps(
+                        [symmetry.layout_atoms(mask) for mask in layout_class]) + '\n')
+
+    summary = {'size': size, 'atom_count': atom_count, 'shards': shards,
+               'layouts': math.comb(square_count, atom_count),
+               'canonical_layouts': canonical, 'ambiguity_classes': classes,
+               'layouts_in_classes': ambiguous_layouts}
+    with open(os.path.join(directory, 'index.json'), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
+
+
+class SignatureIndex:
+    """
+    Reads an index written by build_index, one shard at a time
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: directory the index was written to
+        """
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as summary_file:
+            self.summary = json.load(summary_file)
+        self._symmetry = BoardSymmetry(self.summary['size'])
+
+    def indistinguishable(self, atoms):
+        """
+        Finds every layout with the same signature as the given one, including itself
+        :param atoms: list of (row, column) tuples of atom locations, as many as the index
+                      was built for
+        :return: list of layouts, each a sorted list of (row, column) tuples
+        """
+        if len(set(atoms)) != self.summary['atom_count']:
+            raise ValueError('the index is of layouts of %d atoms' % self.summary['atom_count'])
+        symmetry = self._symmetry
+        signatures = trace_rays([atoms], symmetry.entries, symmetry.size).astype(np.int8)
+
+        # the canonical signature, and a symmetry that turns this layout's signature into it
+        words = [_signature_words(symmetry.move_signatures(signatures, g))[0] for g in range(8)]
+        moved_by = min(range(8), key=lambda g: tuple(words[g]))
+        query = np.zeros(1, dtype=RECORD)
+        for word, field in enumerate(_SIGNATURE_FIELDS):
+            query[field] = words[moved_by][word]
+
+        shard = int(_shard_of(query, self.summary['shards'])[0])
+        records = np.load(os.path.join(self.directory, 'shard-%03d.npy' % shard),
+                          mmap_mode='r')
+        match = np.ones(len(records), dtype=bool)
+        for field in _SIGNATURE_FIELDS:
+            match &= records[field] == query[field][0]
+
+        # the stored layouts have the canonical signature, so moving them back gives the
+        # layouts with this layout's signature
+        back = symmetry.inverse[moved_by]
+        return sorted(symmetry.layout_atoms(symmetry.move_mask(int(mask), back))
+                      for mask in records['layout'][match])
+
+
+def main(argv=None):
+    """
+    Builds an index from the command line and prints its summary
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Find indistinguishable atom layouts')
+    parser.add_argument('atoms', type=int, help='number of atoms in each layout')
+    parser.add_argument('directory', help='directory to write the index to')
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--shards', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+    print(json.dumps(build_index(args.atoms, args.directory, args.size, args.shards,
+                                 args.workers), indent=2))
+
+
+if __name__ == '__main__':
+    main()
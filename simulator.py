@@ -0,0 +1,312 @@
+# Description: Plays many Black Box games with computer players to
+#              gather score statistics. Games are split into shards
+#              that run in a process pool, each shard with its own seed
+#              derived from the base seed, so a run is reproducible no
+#              matter how many processes are used. Each shard sends back
+#              only a SimulationStats of counts, which are merged as
+#              they arrive. Scores are worked out from the number of
+#              entry/exit points used and wrong guesses made, so other
+#              scoring rules can be tried without changing the game.
+#              A player is either the name of one in PLAYERS or any
+#              function that can be pickled, which is sent to the
+#              workers with each shard.
+
+import argparse
+import multiprocessing
+import pickle
+import random
+from collections import Counter
+
+from compact_black_box import CompactBlackBoxGame
+from black_box import entry_points
+
+
+class TrackedGame:
+    """
+    Wraps a game so the simulator can count the rays shot and the distinct wrong guesses
+    made by a player. Has the same methods as BlackBoxGame that a player may use.
+    """
+
+    __slots__ = ('_game', 'rays', 'wrong_guesses', 'correct_guesses')
+
+    def __init__(self, game):
+        """
+        :param game: BlackBoxGame or CompactBlackBoxGame to wrap
+        """
+        self._game = game
+        self.rays = 0
+        self.wrong_guesses = set()
+        self.correct_guesses = set()
+
+    def shoot_ray(self, row, column):
+        """
+        Shoots a ray in the wrapped game, see BlackBoxGame.shoot_ray
+        """
+        exit_point = self._game.shoot_ray(row, column)
+        if exit_point is not False:
+            self.rays += 1
+        return exit_point
+
+    def guess_atom(self, row, column):
+        """
+        Guesses an atom in the wrapped game, see BlackBoxGame.guess_atom
+        """
+        correct = self._game.guess_atom(row, column)
+        (self.correct_guesses if correct else self.wrong_guesses).add((row, column))
+        return correct
+
+    def get_score(self):
+        """
+        Returns the score in the wrapped game
+        """
+        return self._game.get_score()
+
+    def atoms_left(self):
+        """
+        Returns the atoms not yet guessed in the wrapped game
+        """
+        return self._game.atoms_left()
+
+    def points_used(self):
+        """
+        Returns the number of distinct entry/exit points that have been charged for
+        :return: integer number of entry/exit points used
+        """
+        return len(self._game.get_used_points())
+
+
+def random_player(game, rng, atom_count, size):
+    """
+    Shoots a random number of random rays, then guesses squares in a random order until
+    every atom has been found
+    :param game: game to play, with the BlackBoxGame methods
+    :param rng: random.Random to make choices with
+    :param atom_count: integer number of atoms in the game
+    :param size: integer number of rows (and columns) of the board
+    """
+    entries = entry_points(size)
+    for _ in range(rng.randint(0, len(entries))):
+        game.shoot_ray(*rng.choice(entries))
+    interior = [(row, column) for row in range(1, size - 1) for column in range(1, size - 1)]
+    rng.shuffle(interior)
+    for row, column in interior:
+        if game.atoms_left() == 0:
+            break
+        game.guess_atom(row, column)
+
+
+def hit_player(game, rng, atom_count, size):
+    """
+    Shoots every entry point, then guesses first the squares lying in line with the most
+    rays that hit an atom, then the rest in a random order until every atom has been found
+    :param game: game to play, with the BlackBoxGame methods
+    :param rng: random.Random to make choices with
+    :param atom_count: integer number of atoms in the game
+    :param size: integer number of rows (and columns) of the board
+    """
+    last = size - 1
+    votes = Counter()
+    for row, column in entry_points(size):
+        if game.shoot_ray(row, column) is None:
+            if row == 0 or row == last:
+                votes.update((square, column) for square in range(1, last))
+            else:
+                votes.update((row, square) for square in range(1, last))
+    interior = [(row, column) for row in range(1, last) for column in range(1, last)]
+    rng.shuffle(interior)
+    interior.sort(key=lambda square: -votes[square])
+    for row, column in interior:
+        if game.atoms_left() == 0:
+            break
+        game.guess_atom(row, column)
+
+
+# players that can be chosen by name on the command line
+PLAYERS = {
+    'random': random_player,
+    'hit': hit_player,
+}
+
+
+class SimulationStats:
+    """
+    Counts gathered from a number of simulated games, small enough to send between
+    processes. Scores are kept as the (entry/exit points used, wrong guesses) pair of each
+    game so they can be turned into a score under any scoring rules afterwards.
+    """
+
+    def __init__(self):
+        """
+        Starts with no games counted
+        """
+        self.games = 0
+        self.costs = Counter()
+        self.rays = Counter()
+        self.correct_guesses = 0
+        self.wrong_guesses = 0
+
+    def add_game(self, game):
+        """
+        Counts a finished game
+        :param game: TrackedGame that has been played
+        """
+        self.games += 1
+        self.costs[(game.points_used(), len(game.wrong_guesses))] += 1
+        self.rays[game.rays] += 1
+        self.correct_guesses += len(game.correct_guesses)
+        self.wrong_guesses += len(game.wrong_guesses)
+
+    def merge(self, other):
+        """
+        Adds the counts of another SimulationStats to this one
+        :param other: SimulationStats to add
+        :return: this SimulationStats
+        """
+        self.games += other.games
+        self.costs.update(other.costs)
+        self.rays.update(other.rays)
+        self.correct_guesses += other.correct_guesses
+        self.wrong_guesses += other.wrong_guesses
+        return self
+
+    def scores(self, start_score=25, point_cost=1, guess_cost=5):
+        """
+        Returns how many games ended with each score under the given scoring rules
+        :param start_score: integer score a player starts with
+        :param point_cost: integer points deducted for each new entry/exit point
+        :param guess_cost: integer points deducted for each new wrong guess
+        :return: Counter of score to number of games
+        """
+        scores = Counter()
+        for (points, wrong), games in self.costs.items():
+            scores[start_score - point_cost * points - guess_cost * wrong] += games
+        return scores
+
+    def summary(self, start_score=25, point_cost=1, guess_cost=5):
+        """
+        Returns the main statistics under the given scoring rules
+        :param start_score: integer score a player starts with
+        :param point_cost: integer points deducted for each new entry/exit point
+        :param guess_cost: integer points deducted for each new wrong guess
+        :return: dictionary of statistic name to value
+        """
+        scores = self.scores(start_score, point_cost, guess_cost)
+        games = max(self.games, 1)
+        guesses = max(self.correct_guesses + self.wrong_guesses, 1)
+        return {
+            'games': self.games,
+            'mean_score': sum(score * count for score, count in scores.items()) / games,
+            'min_score': min(scores) if scores else None,
+            'max_score': max(scores) if scores else None,
+            'mean_rays': sum(rays * count for rays, count in self.rays.items()) / games,
+            'guess_accuracy': self.correct_guesses / guesses,
+        }
+
+
+def shard_seed(seed, shard):
+    """
+    Derives the seed of one shard from the seed of the whole run
+    :param seed: integer seed of the run
+    :param shard: integer index of the shard
+    :return: string seed for random.Random
+    """
+    return '%d:%d' % (seed, shard)
+
+
+def player_function(player):
+    """
+    Returns the function that plays as the given player, checking it can be sent to the
+    worker processes. Players found by name are looked up in PLAYERS.
+    :param player: name of a player in PLAYERS, or a player function
+    :return: player function
+    """
+    if isinstance(player, str):
+        if player not in PLAYERS:
+            raise ValueError('unknown player %r' % (player,))
+        return PLAYERS[player]
+    if not callable(player):
+        raise ValueError('player must be a name or a function, not %r' % (player,))
+
+    # a lambda or nested function would only fail once the pool tried to send it
+    try:
+        pickle.dumps(player)
+    except (pickle.PicklingError, AttributeError, TypeError) as error:
+        raise ValueError('player %r cannot be sent to worker processes: %s'
+                         % (player, error)) from None
+    return player
+
+
+def run_shard(job):
+    """
+    Plays the games of one shard. Runs in a worker process.
+    :param job: tuple of (seed, shard index, number of games, atoms per game, board size,
+                player function)
+    :return: SimulationStats of the shard's games
+    """
+    seed, shard, games, atom_count, size, play = job
+    rng = random.Random(shard_seed(seed, shard))
+    interior = [(row, column) for row in range(1, size - 1) for column in range(1, size - 1)]
+    stats = SimulationStats()
+    for _ in range(games):
+        game = TrackedGame(CompactBlackBoxGame(rng.sample(interior, atom_count), size))
+        play(game, rng, atom_count, size)
+        stats.add_game(game)
+    return stats
+
+
+def simulate(games, atom_count=4, size=10, player='random', seed=0, shard_size=5000,
+             workers=None):
+    """
+    Plays the given number of games split into shards over a pool of processes, and
+    yields the running totals each time a shard finishes. The final totals do not depend
+    on the number of workers.
+    :param games: integer number of games to play
+    :param atom_count: integer number of atoms in each game
+    :param size: integer number of rows (and columns) of the board
+    :param player: name of a player in PLAYERS, or a function taking the same arguments
+                   as random_player that can be pickled (defined at the top level of a
+                   module), since it is sent to the worker processes
+    :param seed: integer seed of the run
+    :param shard_size: integer number of games played by each shard
+    :param workers: integer number of processes, defaults to the number of CPUs
+    :return: generator of SimulationStats, the last one covering every game
+    """
+    play = player_function(player)
+    jobs = [(seed, shard, min(shard_size, games - start), atom_count, size, play)
+            for shard, start in enumerate(range(0, games, shard_size))]
+    totals = SimulationStats()
+    with multiprocessing.Pool(workers) as pool:
+        for stats in pool.imap_unordered(run_shard, jobs):
+            yield totals.merge(stats)
+
+
+def main(argv=None):
+    """
+    Runs a simulation from the command line and prints the running statistics
+    :param argv: list of command line arguments, defaults to sys.argv
+    """
+    parser = argparse.ArgumentParser(description='Simulate Black Box games')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--atoms', type=int, default=4)
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--player', choices=sorted(PLAYERS), default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shard-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--start-score', type=int, default=25)
+    parser.add_argument('--point-cost', type=int, default=1)
+    parser.add_argument('--guess-cost', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    stats = None
+    for stats in simulate(args.games, args.atoms, args.size, args.player, args.seed,
+                          args.shard_size, args.workers):
+        print(stats.summary(args.start_score, args.point_cost, args.guess_cost))
+    if stats is not None:
+        scores = stats.scores(args.start_score, args.point_cost, args.guess_cost)
+        for score in sorted(scores):
+            print('%5d %d' % (score, scores[score]))
+
+
+if __name__ == '__main__':
+    main()
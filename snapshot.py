@@ -0,0 +1,226 @@
+# Description: Fixed-width binary snapshots of Black Box game state and a
+#              memory-mapped file that holds many of them. A snapshot
+#              holds the board size, score and atoms remaining, followed
+#              by bitmasks of the atoms, the guessed squares and the used
+#              entry/exit points, all little-endian. Every snapshot for a
+#              given board size has the same length, so the store can
+#              keep each session in a numbered slot and read or write it
+#              in place without touching the rest of the file.
+
+import mmap
+import os
+import struct
+
+# size, score, atoms remaining
+_HEADER = struct.Struct('<HiI')
+
+# magic, format version, board size, slot length, number of slots
+_FILE_HEADER = struct.Struct('<4sHHIQ')
+_MAGIC = b'BBXS'
+_VERSION = 1
+
+
+def _mask_lengths(size):
+    """
+    Returns the number of bytes used by the square masks and the entry/exit point mask
+    :param size: integer number of rows (and columns) of the board
+    :return: tuple of (square mask length, entry/exit point mask length)
+    """
+    return (size * size + 7) // 8, (4 * (size - 2) + 7) // 8
+
+
+def snapshot_length(size=10):
+    """
+    Returns the number of bytes in a snapshot of a game on a board of the given size
+    :param size: integer number of rows (and columns) of the board
+    :return: integer length in bytes
+    """
+    squares, points = _mask_lengths(size)
+    return _HEADER.size + 2 * squares + points
+
+
+def set_bits(mask):
+    """
+    Yields the positions of the set bits of a mask, lowest first
+    :param mask: non-negative integer
+    :return: generator of integer bit positions
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def pack_state(size, score, atoms_remaining, atoms, guesses, used_points):
+    """
+    Encodes the state of a game. Square masks have bit row * size + column set, and the
+    entry/exit point mask has bit i set for point i of black_box.entry_points(size).
+    :param size: integer number of rows (and columns) of the board
+    :param score: integer current score
+    :param atoms_remaining: integer number of atoms not yet guessed
+    :param atoms: integer mask of the squares holding atoms
+    :param guesses: integer mask of the squares that have been guessed
+    :param used_points: integer mask of the entry/exit points that have been used
+    :return: bytes of length snapshot_length(size)
+    """
+    squares, points = _mask_lengths(size)
+    return b''.join((_HEADER.pack(size, score, atoms_remaining),
+                     atoms.to_bytes(squares, 'little'),
+                     guesses.to_bytes(squares, 'little'),
+                     used_points.to_bytes(points, 'little')))
+
+
+def unpack_state(data):
+    """
+    Decodes a snapshot made by pack_state, raising ValueError if it is the wrong length
+    :param data: bytes-like object holding the snapshot
+    :return: tuple of (size, score, atoms remaining, atom mask, guess mask, used entry/exit
+             point mask)
+    """
+    size, score, atoms_remaining = _HEADER.unpack_from(data)
+    if len(data) != snapshot_length(size):
+        raise ValueError('snapshot of a %dx%d board should be %d bytes, not %d'
+                         % (size, size, snapshot_length(size), len(data)))
+    squares, points = _mask_lengths(size)
+    start = _HEADER.size
+    atoms = int.from_bytes(data[start:start + squares], 'little')
+    guesses = int.from_bytes(data[start + squares:start + 2 * squares], 'little')
+    used_points = int.from_bytes(data[start + 2 * squares:start + 2 * squares + points],
+                                 'little')
+    return size, score, atoms_remaining, atoms, guesses, used_points
+
+
+class SessionStore:
+    """
+    A file of numbered slots, each holding one game snapshot or nothing, accessed through
+    a memory map. Only the pages of the slots that are read or written are brought into
+    memory, so the file can hold millions of sessions. Each slot is a one byte flag (1 if
+    the slot holds a game) followed by a snapshot.
+    """
+
+    def __init__(self, path):
+        """
+        Opens an existing store file, raising ValueError if it is not one or is not as long
+        as its header says
+        :param path: file name of the store
+        """
+        self._file = open(path, 'r+b')
+        header = self._file.read(_FILE_HEADER.size)
+        if len(header) != _FILE_HEADER.size:
+            self._file.close()
+            raise ValueError('%s is not a session store' % (path,))
+        magic, version, self.size, self._slot_length, self.capacity = \
+            _FILE_HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION:
+            self._file.close()
+            raise ValueError('%s is not a session store' % (path,))
+
+        # a file cut short would otherwise only fail when a missing slot is read
+        length = _FILE_HEADER.size + self.capacity * self._slot_length
+        if (self._slot_length != 1 + snapshot_length(self.size) or
+                os.fstat(self._file.fileno()).st_size != length):
+            self._file.close()
+            raise ValueError('%s should be %d bytes long for %d slots of %dx%d boards'
+                             % (path, length, self.capacity, self.size, self.size))
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._view = memoryview(self._map)
+
+    @classmethod
+    def create(cls, path, capacity, size=10):
+        """
+        Creates a new, empty store file. The file is sparse where the filesystem allows,
+        so unused slots take no disk space.
+        :param path: file name of the store, replaced if it already exists
+        :param capacity: integer number of slots
+        :param size: integer number of rows (and columns) of the boards it will hold
+        :return: SessionStore
+        """
+        slot_length = 1 + snapshot_length(size)
+        with open(path, 'wb') as store_file:
+            store_file.write(_FILE_HEADER.pack(_MAGIC, _VERSION, size, slot_length, capacity))
+            store_file.truncate(_FILE_HEADER.size + capacity * slot_length)
+        return cls(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.capacity
+
+    def close(self):
+        """
+        Writes any changes back to the file and closes it
+        """
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def flush(self):
+        """
+        Writes any changes back to the file
+        """
+        self._map.flush()
+
+    def _offset(self, slot):
+        """
+        Returns the position in the file of a slot, raising IndexError if there is no such
+        slot
+        :param slot: integer slot number
+        :return: integer offset in bytes
+        """
+        if not 0 <= slot < self.capacity:
+            raise IndexError('slot %d out of range' % (slot,))
+        return _FILE_HEADER.size + slot * self._slot_length
+
+    def save(self, slot, game):
+        """
+        Writes a game into a slot, replacing what was there
+        :param slot: integer slot number
+        :param game: BlackBoxGame or CompactBlackBoxGame of this store's board size
+        """
+        offset = self._offset(slot)
+        data = game.to_bytes()
+        if len(data) != self._slot_length - 1:
+            raise ValueError('game does not have a %dx%d board' % (self.size, self.size))
+        self._map[offset + 1:offset + self._slot_length] = data
+        self._map[offset] = 1
+
+    def load(self, slot, game_class):
+        """
+        Reads the game in a slot
+        :param slot: integer slot number
+        :param game_class: BlackBoxGame or CompactBlackBoxGame, the class to return
+        :return: game of the given class, or None if the slot is empty
+        """
+        offset = self._offset(slot)
+        if not self._map[offset]:
+            return None
+        return game_class.from_bytes(self._view[offset + 1:offset + self._slot_length])
+
+    def delete(self, slot):
+        """
+        Empties a slot
+        :param slot: integer slot number
+        """
+        self._map[self._offset(slot)] = 0
+
+    def grow(self, capacity):
+        """
+        Adds empty slots to the end of the store
+        :param capacity: integer new number of slots, not less than the current number
+        """
+        if capacity < self.capacity:
+            raise ValueError('cannot shrink a session store')
+        self._view.release()
+        self._map.close()
+        self._file.truncate(_FILE_HEADER.size + capacity * self._slot_length)
+        self._file.seek(0)
+        self._file.write(_FILE_HEADER.pack(_MAGIC, _VERSION, self.size, self._slot_length,
+                                           capacity))
+        self._file.flush()
+        self.capacity = capacity
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._view = memoryview(self._map)
@@ -0,0 +1,214 @@
+# Description: Deduces where the atoms of a Black Box game can be from
+#              the rays shot so far. A SignatureTable lists every layout
+#              of a given number of atoms on the board, together with
+#              the outcome of every entry point on each layout (its
+#              signature), traced once with batch_trace.trace_rays and
+#              optionally saved to disk. An AtomSolver keeps the indices
+#              of the layouts that are still consistent with what has
+#              been observed and narrows them down as each ray arrives.
+
+import itertools
+import math
+import os
+
+import numpy as np
+
+from batch_trace import HIT, REFLECTION, trace_rays
+from black_box import entry_point_index, entry_points
+
+
+def exit_to_outcome(entry, exit_point, size=10):
+    """
+    Converts what BlackBoxGame.shoot_ray returned into the outcome code used by
+    batch_trace.trace_rays
+    :param entry: (row, column) tuple of the entry point the ray was shot from
+    :param exit_point: None if a hit occurred, otherwise the (row, column) exit point
+    :param size: integer representing the number of rows (and columns) of the board
+    :return: integer index of the exit point, HIT or REFLECTION
+    """
+    if exit_point is None:
+        return HIT
+    if tuple(exit_point) == tuple(entry):
+        return REFLECTION
+    index = entry_point_index(exit_point[0], exit_point[1], size)
+    if index == -1:
+        raise ValueError('%r is not an allowed exit point' % (tuple(exit_point),))
+    return index
+
+
+class SignatureTable:
+    """
+    Every layout of a fixed number of atoms on the interior of a board, and the outcome of
+    every entry point on each of them. Row i of layouts holds the cells (row * size +
+    column) of layout i in increasing order, and row i of signatures holds its outcomes
+    in the order of black_box.entry_points(size). Tables are expensive to build, so one
+    table is meant to be shared by every solver for that board size and atom count.
+    """
+
+    def __init__(self, atom_count, size=10, layouts=None, signatures=None):
+        """
+        Enumerates every layout of the given number of atoms. The signatures are traced
+        when build is called, unless they are passed in (as load does).
+        :param atom_count: integer number of atoms in each layout
+        :param size: integer representing the number of rows (and columns) of the board
+        :param layouts: optional array of layouts, see the class description
+        :param signatures: optional array of signatures, see the class description
+        """
+        self.atom_count = atom_count
+        self.size = size
+        self.entries = entry_points(size)
+        if layouts is None:
+            layouts = all_layouts(atom_count, size)
+        self.layouts = layouts
+        self.signatures = signatures
+
+    def build(self):
+        """
+        Traces every entry point on every layout, unless this has been done already
+        :return: the signatures array
+        """
+        if self.signatures is not None:
+            return self.signatures
+        outcome_type = np.int8 if len(self.entries) < 128 else np.int16
+        signatures = np.empty((len(self.layouts), len(self.entries)), dtype=outcome_type)
+        self.signatures = trace_rays(self.layouts, self.entries, self.size, signatures)
+        return self.signatures
+
+    def save(self, path):
+        """
+        Writes the table, building it first if needed, to a .npz file
+        :param path: file name to write to
+        """
+        np.savez(path, size=self.size, atom_count=self.atom_count, layouts=self.layouts,
+                 signatures=self.build())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a table written by save
+        :param path: file name to read from
+        :return: SignatureTable
+        """
+        with np.load(path) as data:
+            return cls(int(data['atom_count']), int(data['size']), data['layouts'],
+                       data['signatures'])
+
+    @classmethod
+    def load_or_build(cls, path, atom_count, size=10):
+        """
+        Reads the table saved at path, or builds one and saves it there if there is none.
+        np.savez adds .npz to file names without it, so path is looked for with .npz added
+        the same way.
+        :param path: file name of the table, or None to build one without saving it
+        :param atom_count: integer number of atoms of the table to build
+        :param size: integer number of rows (and columns) of the board of the table to build
+        :return: SignatureTable
+        """
+        if path and not path.endswith('.npz'):
+            path += '.npz'
+        if path and os.path.exists(path):
+            return cls.load(path)
+        table = cls(atom_count, size)
+        if path:
+            table.save(path)
+        return table
+
+    def layout_atoms(self, index):
+        """
+        Returns the atom locations of a layout, as passed to BlackBoxGame
+        :param index: integer index of the layout
+        :return: list of (row, column) tuples
+        """
+        return [divmod(int(cell), self.size) for cell in self.layouts[index]]
+
+
+def all_layouts(atom_count, size=10):
+    """
+    Lists every way of placing the given number of atoms on the interior of a board
+    :param atom_count: integer number of atoms in each layout
+    :param size: integer representing the number of rows (and columns) of the board
+    :return: array of shape (layouts, atom_count) of cell numbers (row * size + column),
+             each row in increasing order
+    """
+    interior = np.array([row * size + column for row in range(1, size - 1)
+                         for column in range(1, size - 1)], dtype=np.int32)
+    count = math.comb(len(interior), atom_count)
+    positions = np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(len(interior)), atom_count)),
+        dtype=np.int32, count=count * atom_count)
+    cell_type = np.int16 if size * size <= np.iinfo(np.int16).max else np.int32
+    return interior[positions].reshape(count, atom_count).astype(cell_type)
+
+
+class AtomSolver:
+    """
+    Keeps track of the atom layouts that are consistent with the rays shot in one game.
+    Each observation only looks up the outcome column of its entry point for the layouts
+    that are still candidates, so the work done per ray shrinks as the candidates do.
+    """
+
+    def __init__(self, table):
+        """
+        Starts with every layout in the table as a candidate
+        :param table: SignatureTable for the game's board size and number of atoms
+        """
+        self._table = table
+        self._signatures = table.build()
+        self._candidates = np.arange(len(table.layouts), dtype=np.int32)
+
+    def observe(self, entry, exit_point):
+        """
+        Removes the candidates that would not give the observed result for a ray. A
+        result of False (not an allowed entry point) tells nothing and is ignored; any other
+        result for a square that is not an allowed entry point raises ValueError.
+        :param entry: (row, column) tuple of the entry point the ray was shot from
+        :param exit_point: the value BlackBoxGame.shoot_ray returned for that entry
+        :return: integer number of candidates remaining
+        """
+        if exit_point is False:
+            return len(self._candidates)
+        size = self._table.size
+        column = entry_point_index(entry[0], entry[1], size)
+        if column == -1:
+            raise ValueError('%r is not an allowed entry point' % (entry,))
+        outcome = exit_to_outcome(entry, exit_point, size)
+        candidates = self._candidates
+        self._candidates = candidates[self._signatures[candidates, column] == outcome]
+        return len(self._candidates)
+
+    def candidate_count(self):
+        """
+        Returns the number of layouts still consistent with the observations
+        :return: integer number of candidates
+        """
+        return len(self._candidates)
+
+    def candidate_indices(self):
+        """
+        Returns the indices into the table of the layouts still consistent with the
+        observations
+        :return: read-only array of layout indices
+        """
+        candidates = self._candidates.view()
+        candidates.flags.writeable = False
+        return candidates
+
+    def candidates(self):
+        """
+        Returns the layouts still consistent with the observations
+        :return: list of lists of (row, column) tuples
+        """
+        return [self._table.layout_atoms(index) for index in self._candidates]
+
+    def probabilities(self):
+        """
+        Returns, for every square, the fraction of the remaining candidates that have an
+        atom on it. All zeros if no candidates remain.
+        :return: float array of shape (size, size)
+        """
+        size = self._table.size
+        counts = np.bincount(self._table.layouts[self._candidates].ravel(),
+                             minlength=size * size)
+        if len(self._candidates):
+            counts = counts / len(self._candidates)
+        return counts.reshape(size, size).astype(float)
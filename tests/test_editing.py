@@ -0,0 +1,89 @@
+# Description: Tests of add_atom and remove_atom, which forget only the
+#              cached ray outcomes whose paths pass next to the changed
+#              square. Run from the repository root with
+#                  python -m unittest discover tests
+
+import random
+import unittest
+
+from black_box import BlackBoxGame, entry_points
+
+
+class ForgetNearTest(unittest.TestCase):
+
+    def test_only_rays_next_to_the_square_are_forgotten(self):
+        game = BlackBoxGame([])
+        game.build_ray_table()
+        self.assertTrue(game.add_atom(5, 5))
+
+        # on an empty board every ray is straight, so the ones forgotten are those along
+        # rows and columns 4 to 6
+        near = {entry for entry in entry_points() if 4 <= entry[0] <= 6 or 4 <= entry[1] <= 6}
+        self.assertEqual(len(near), 12)
+        self.assertEqual(set(game._ray_outcomes), set(entry_points()) - near)
+        self.assertEqual(dict(game.ray_table()), dict(BlackBoxGame([(5, 5)]).ray_table()))
+
+    def test_deflected_ray_is_forgotten(self):
+        # the ray from (0, 4) turns on (2, 4) and leaves along row 2, so an atom placed
+        # next to that row, far from where the ray entered, forgets it
+        game = BlackBoxGame([(3, 5)])
+        self.assertEqual(game.shoot_ray(0, 4), (2, 0))
+        self.assertTrue(game.add_atom(1, 1))
+        self.assertNotIn((0, 4), game._ray_outcomes)
+        self.assertEqual(game.shoot_ray(0, 4), BlackBoxGame([(3, 5), (1, 1)]).trace_ray(0, 4))
+
+    def test_edge_reflection_is_forgotten(self):
+        game = BlackBoxGame([(1, 5)])
+        self.assertEqual(game.shoot_ray(0, 4), (0, 4))
+        self.assertTrue(game.remove_atom(1, 5))
+        self.assertNotIn((0, 4), game._ray_outcomes)
+        self.assertEqual(game.shoot_ray(0, 4), (9, 4))
+
+    def test_ray_table_is_not_changed_by_edits(self):
+        game = BlackBoxGame([(3, 5)])
+        table = game.ray_table()
+        before = dict(table)
+        self.assertTrue(game.add_atom(5, 5))
+        self.assertTrue(game.remove_atom(3, 5))
+        self.assertEqual(dict(table), before)
+        self.assertEqual(len(table), 32)
+        self.assertEqual(dict(game.ray_table()), dict(BlackBoxGame([(5, 5)]).ray_table()))
+
+    def test_clone_table_is_not_changed_by_edits(self):
+        game = BlackBoxGame([(3, 5)])
+        game.build_ray_table()
+        copy = game.clone()
+        self.assertTrue(game.add_atom(5, 5))
+        self.assertEqual(dict(copy.ray_table()), dict(BlackBoxGame([(3, 5)]).ray_table()))
+        self.assertEqual(dict(game.ray_table()),
+                         dict(BlackBoxGame([(3, 5), (5, 5)]).ray_table()))
+
+    def test_bad_edits(self):
+        game = BlackBoxGame([(3, 5)])
+        self.assertFalse(game.add_atom(0, 4))
+        self.assertFalse(game.add_atom(3, 5))
+        self.assertFalse(game.remove_atom(4, 4))
+        self.assertEqual(game.atoms_left(), 1)
+
+    def test_random_edits_match_fresh_games(self):
+        rng = random.Random(0)
+        for _ in range(100):
+            size = rng.choice((5, 8, 10))
+            game = BlackBoxGame([], size)
+            entries = entry_points(size)
+            for _ in range(20):
+                for row, column in rng.sample(entries, 4):
+                    game.shoot_ray(row, column)
+                square = (rng.randrange(1, size - 1), rng.randrange(1, size - 1))
+                if square in game._atom_locations:
+                    self.assertTrue(game.remove_atom(*square))
+                else:
+                    self.assertTrue(game.add_atom(*square))
+                fresh = BlackBoxGame(game._atom_locations, size)
+                for entry, exit_point in game._ray_outcomes.items():
+                    self.assertEqual(fresh.trace_ray(*entry), exit_point)
+            self.assertEqual(dict(game.ray_table()), dict(fresh.ray_table()))
+
+
+if __name__ == '__main__':
+    unittest.main()
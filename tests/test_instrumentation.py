@@ -0,0 +1,91 @@
+# Description: Tests of the ray instrumentation in instrumentation.py, and
+#              of the copy of shoot_ray without the instrumentation hook
+#              that the benchmark suite times it against. Run from the
+#              repository root with
+#                  python -m unittest discover tests
+
+import random
+import unittest
+
+import instrumentation
+from benchmarks.suite import UnhookedBlackBoxGame
+from black_box import BlackBoxGame, entry_points
+from compact_black_box import CompactBlackBoxGame
+from instrumentation import RayInstrumentation, RayRecord, RingBufferSink
+
+
+def record(atoms, entry):
+    """
+    Traces one ray and records it
+    :param atoms: list of (row, column) tuples of atom locations
+    :param entry: (row, column) tuple of the entry point
+    :return: RayRecord of the ray
+    """
+    turning_points = []
+    exit_point = BlackBoxGame(atoms).trace_ray(entry[0], entry[1], turning_points)
+    return RayRecord(entry, exit_point, turning_points)
+
+
+class RayRecordTest(unittest.TestCase):
+
+    def test_kinds_and_counts(self):
+        straight = record([], (0, 4))
+        self.assertEqual((straight.kind, straight.steps, straight.deflections), ('exit', 9, 0))
+        deflected = record([(3, 5)], (0, 4))
+        self.assertEqual((deflected.kind, deflected.steps, deflected.deflections),
+                         ('exit', 6, 1))
+        self.assertEqual(deflected.path, [(0, 4), (1, 4), (2, 4), (2, 3), (2, 2), (2, 1),
+                                          (2, 0)])
+        hit = record([(5, 4)], (0, 4))
+        self.assertEqual((hit.kind, hit.steps, hit.deflections), ('hit', 4, 0))
+
+    def test_reflections(self):
+        edge = record([(1, 5)], (0, 4))
+        self.assertEqual((edge.kind, edge.steps, edge.deflections), ('reflection', 0, 1))
+        double = record([(3, 3), (3, 5)], (0, 4))
+        self.assertEqual((double.kind, double.steps, double.deflections), ('reflection', 4, 2))
+        self.assertEqual(double.as_dict()['path'], [[0, 4], [1, 4], [2, 4], [1, 4], [0, 4]])
+
+
+class EnableTest(unittest.TestCase):
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_both_classes_recorded_alike(self):
+        shots = random.Random(0).sample(entry_points(), 20)
+        atoms = [(3, 2), (1, 7), (4, 6), (8, 8), (5, 3)]
+        records = {}
+        for game_class in (BlackBoxGame, CompactBlackBoxGame):
+            sink = RingBufferSink(100)
+            instrumentation.enable(RayInstrumentation([sink]))
+            game = game_class(atoms)
+            for row, column in shots:
+                game.shoot_ray(row, column)
+            instrumentation.disable()
+            game.shoot_ray(0, 1)
+            records[game_class] = [record.as_dict() for record in sink.records]
+        self.assertEqual(len(records[BlackBoxGame]), 20)
+        self.assertEqual(records[BlackBoxGame], records[CompactBlackBoxGame])
+
+
+class UnhookedGameTest(unittest.TestCase):
+
+    def test_same_as_black_box_game(self):
+        # the benchmark's copy of shoot_ray must keep doing what the real one does
+        rng = random.Random(1)
+        moves = [(rng.randrange(-1, 11), rng.randrange(-1, 11)) for _ in range(200)]
+        moves += entry_points()
+        games = (BlackBoxGame([(3, 2), (1, 7), (4, 6)]),
+                 UnhookedBlackBoxGame([(3, 2), (1, 7), (4, 6)]))
+        for game in games:
+            game.start_journal()
+        for row, column in moves:
+            self.assertEqual(games[1].shoot_ray(row, column), games[0].shoot_ray(row, column))
+        self.assertEqual(games[1].to_bytes(), games[0].to_bytes())
+        self.assertEqual(games[1].get_used_points(), games[0].get_used_points())
+        self.assertEqual(games[1]._undo_moves, games[0]._undo_moves)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# Description: Tests of the puzzles made by puzzle_generator.py, checked
+#              by brute force against the ray table of every layout of a
+#              small board: only a puzzle's own layout gives its exits,
+#              and none of its rays can be left out. Run from the
+#              repository root with
+#                  python -m unittest discover tests
+
+import unittest
+
+from black_box import BlackBoxGame, ray_deflections
+from instrumentation import RayRecord
+from puzzle_generator import DIFFICULTIES, PuzzleGenerator
+from solver import SignatureTable
+
+# every layout of 3 atoms on a 7x7 board, with the outcome of every entry point on each
+TABLE = SignatureTable(3, 7)
+GENERATOR = PuzzleGenerator(TABLE, seed=0)
+RAY_TABLES = [dict(BlackBoxGame(TABLE.layout_atoms(index), 7).ray_table())
+              for index in range(len(TABLE.layouts))]
+
+# (entry point, exit) -> set of the indices of the layouts giving that exit
+LAYOUTS_BY_RAY = {}
+for layout, rays in enumerate(RAY_TABLES):
+    for ray in rays.items():
+        LAYOUTS_BY_RAY.setdefault(ray, set()).add(layout)
+
+
+def matching_layouts(entries, exits):
+    """
+    Returns the sorted indices of the layouts whose rays from the given entry points give
+    the given exits
+    """
+    layouts = set(range(len(RAY_TABLES)))
+    for ray in zip(entries, exits):
+        layouts &= LAYOUTS_BY_RAY[ray]
+    return sorted(layouts)
+
+
+class PuzzleTest(unittest.TestCase):
+
+    def test_puzzles_are_unique_and_irredundant(self):
+        made = 0
+        for index in range(0, len(TABLE.layouts), 3):
+            puzzle = GENERATOR.puzzle(index)
+            if puzzle is None:
+                # only a layout with the same outcome on every entry point is refused
+                self.assertGreater(RAY_TABLES.count(RAY_TABLES[index]), 1)
+                continue
+            made += 1
+            self.assertEqual(sorted(puzzle.atoms), sorted(TABLE.layout_atoms(index)))
+            self.assertEqual(puzzle.exits, [RAY_TABLES[index][entry]
+                                            for entry in puzzle.entries])
+            self.assertEqual(len(set(puzzle.entries)), puzzle.rays())
+            self.assertEqual(matching_layouts(puzzle.entries, puzzle.exits), [index])
+            for left_out in range(puzzle.rays()):
+                entries = puzzle.entries[:left_out] + puzzle.entries[left_out + 1:]
+                exits = puzzle.exits[:left_out] + puzzle.exits[left_out + 1:]
+                self.assertGreater(len(matching_layouts(entries, exits)), 1)
+        self.assertGreater(made, 200)
+
+    def test_deflections_match_ray_records(self):
+        for index in range(0, len(TABLE.layouts), 5):
+            puzzle = GENERATOR.puzzle(index)
+            if puzzle is None:
+                continue
+            game = BlackBoxGame(puzzle.atoms, 7)
+            for entry, exit_point, deflections in zip(puzzle.entries, puzzle.exits,
+                                                      puzzle.deflections):
+                turning_points = []
+                game.trace_ray(entry[0], entry[1], turning_points)
+                record = RayRecord(entry, exit_point, turning_points)
+                self.assertEqual(deflections, record.deflections)
+
+    def test_edge_reflection_is_one_deflection(self):
+        turning_points = []
+        game = BlackBoxGame([(1, 3)], 7)
+        self.assertEqual(game.trace_ray(0, 2, turning_points), (0, 2))
+        self.assertEqual(ray_deflections((0, 2), (0, 2), turning_points), 1)
+        turning_points = []
+        self.assertEqual(game.trace_ray(0, 5, turning_points), (6, 5))
+        self.assertEqual(ray_deflections((0, 5), (6, 5), turning_points), 0)
+
+    def test_difficulty(self):
+        generator = PuzzleGenerator(TABLE, seed=1)
+        for name, (fewest, most, multi) in DIFFICULTIES.items():
+            for puzzle in generator.generate(20, name):
+                self.assertTrue(fewest <= puzzle.rays() <= most)
+                self.assertGreaterEqual(puzzle.multi_deflections(), multi)
+
+
+if __name__ == '__main__':
+    unittest.main()
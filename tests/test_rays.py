@@ -0,0 +1,125 @@
+# Description: Regression tests for the ray rules. Known outcomes of a few
+#              small layouts are pinned (each matches the original
+#              recursive implementation), and BlackBoxGame,
+#              CompactBlackBoxGame and batch_trace.trace_rays are checked
+#              to agree on every entry point of random layouts. Run from
+#              the repository root with
+#                  python -m unittest discover tests
+
+import random
+import unittest
+
+import numpy as np
+
+import batch_trace
+from batch_trace import boards_from_layouts, outcome_to_exit, trace_rays
+from black_box import BlackBoxGame, entry_points
+from compact_black_box import CompactBlackBoxGame
+
+
+def random_layout(rng, size, atom_count):
+    """
+    Places atoms on distinct squares inside the border
+    :param rng: random.Random to place them with
+    :param size: integer number of rows (and columns) of the board
+    :param atom_count: integer number of atoms
+    :return: list of (row, column) tuples of atom locations
+    """
+    cells = rng.sample(range((size - 2) ** 2), atom_count)
+    return [(1 + cell // (size - 2), 1 + cell % (size - 2)) for cell in cells]
+
+
+class KnownOutcomeTest(unittest.TestCase):
+    """
+    Outcomes of rays shot from (0, 4), straight down column 4 of the standard board
+    """
+
+    def assertRay(self, atoms, exit_point, turning_points):
+        game = BlackBoxGame(atoms)
+        traced = []
+        self.assertEqual(game.trace_ray(0, 4, traced), exit_point)
+        self.assertEqual(traced, turning_points)
+        self.assertEqual(game.shoot_ray(0, 4), exit_point)
+        self.assertEqual(CompactBlackBoxGame(atoms).shoot_ray(0, 4), exit_point)
+
+    def test_straight(self):
+        self.assertRay([], (9, 4), [(9, 4)])
+
+    def test_single_deflection(self):
+        # the atom diagonally ahead at (3, 5) turns the ray left on (2, 4)
+        self.assertRay([(3, 5)], (2, 0), [(2, 4), (2, 0)])
+
+    def test_edge_reflection(self):
+        # an atom diagonally next to the entry point sends the ray straight back
+        self.assertRay([(1, 5)], (0, 4), [(0, 4)])
+
+    def test_double_deflection_reflection(self):
+        # atoms on both diagonals ahead turn the ray twice on (2, 4), back the way it came
+        self.assertRay([(3, 3), (3, 5)], (0, 4), [(2, 4), (2, 4), (0, 4)])
+
+    def test_hit(self):
+        self.assertRay([(5, 4)], None, [(4, 4)])
+
+    def test_boxed_in(self):
+        # between atoms on opposite diagonals the ray turns left, down, left, down without
+        # moving, so after four turns it is treated as reflected back to where it started
+        game = BlackBoxGame([(3, 3), (5, 5)])
+        traced = []
+        self.assertEqual(game.follow_ray(4, 4, 'down', traced), (4, 4))
+        self.assertEqual(traced, [(4, 4)] * 5)
+
+
+class ImplementationsAgreeTest(unittest.TestCase):
+    """
+    Every entry point of random layouts gives the same outcome in each implementation
+    """
+
+    def test_random_layouts(self):
+        rng = random.Random(0)
+        for size in (5, 10, 14):
+            entries = entry_points(size)
+            layouts = [random_layout(rng, size, rng.randint(0, (size - 2) ** 2 // 3))
+                       for _ in range(100)]
+            outcomes = trace_rays(layouts, entries, size)
+            for layout, layout_outcomes in zip(layouts, outcomes):
+                game = BlackBoxGame(layout, size)
+                compact = CompactBlackBoxGame(layout, size)
+                for entry, outcome in zip(entries, layout_outcomes):
+                    expected = game.shoot_ray(entry[0], entry[1])
+                    self.assertEqual(compact.shoot_ray(entry[0], entry[1]), expected,
+                                     (size, layout, entry))
+                    self.assertEqual(outcome_to_exit(int(outcome), entry, size), expected,
+                                     (size, layout, entry))
+
+    def test_large_board(self):
+        # boards over 64 squares across build CompactBlackBoxGame's atom mask another way
+        rng = random.Random(1)
+        layout = random_layout(rng, 70, 600)
+        game = BlackBoxGame(layout, 70)
+        compact = CompactBlackBoxGame(layout, 70)
+        for row, column in entry_points(70):
+            self.assertEqual(compact.trace_ray(row, column), game.trace_ray(row, column))
+
+    def test_trace_rays_in_chunks(self):
+        # a chunk that does not divide the boards evenly, with every form of input
+        rng = random.Random(2)
+        layouts = [random_layout(rng, 9, 5) for _ in range(37)]
+        entries = entry_points(9)
+        expected = trace_rays(layouts, entries, 9)
+        cells = np.array([[row * 9 + column for row, column in layout] for layout in layouts])
+        chunk_lanes = batch_trace.CHUNK_LANES
+        batch_trace.CHUNK_LANES = 3 * len(entries) + 1
+        try:
+            self.assertTrue((trace_rays(layouts, entries, 9) == expected).all())
+            self.assertTrue((trace_rays(cells, entries, 9) == expected).all())
+            self.assertTrue((trace_rays(boards_from_layouts(layouts, 9), entries) ==
+                             expected).all())
+            out = np.empty(expected.shape, dtype=np.int8)
+            self.assertIs(trace_rays(cells, entries, 9, out), out)
+            self.assertTrue((out == expected).all())
+        finally:
+            batch_trace.CHUNK_LANES = chunk_lanes
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# Description: Tests of the search support of BlackBoxGame: the move
+#              journal behind undo and redo, and clones that share their
+#              board, atoms and ray tables with the game they were made
+#              from until atoms are added or removed. Run from the
+#              repository root with
+#                  python -m unittest discover tests
+
+import random
+import unittest
+
+from black_box import BlackBoxGame, entry_points
+
+ATOMS = [(3, 2), (1, 7), (4, 6), (8, 8)]
+
+
+def state(game):
+    """
+    Returns everything about a game that moves change
+    :param game: BlackBoxGame
+    :return: tuple of score, atoms left, guesses and used entry/exit points
+    """
+    return (game.get_score(), game.atoms_left(), list(game._guesses),
+            game.get_used_points())
+
+
+def random_move(game, rng):
+    """
+    Makes a random shot or guess, sometimes one that is not allowed or repeats an earlier one
+    :param game: BlackBoxGame to move in
+    :param rng: random.Random to choose the move with
+    """
+    if rng.random() < 0.6:
+        game.shoot_ray(*rng.choice(entry_points() + [(0, 0), (4, 4)]))
+    else:
+        game.guess_atom(rng.randrange(-1, 11), rng.randrange(-1, 11))
+
+
+class JournalTest(unittest.TestCase):
+
+    def test_undo_and_redo_restore_each_state(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            game = BlackBoxGame(ATOMS)
+            game.start_journal()
+            states = [state(game)]
+            for _ in range(rng.randint(1, 30)):
+                random_move(game, rng)
+                states.append(state(game))
+
+            undone = rng.randint(1, len(states) - 1)
+            for back in range(1, undone + 1):
+                self.assertTrue(game.undo())
+                self.assertEqual(state(game), states[-1 - back])
+            for forward in range(undone - 1, -1, -1):
+                self.assertTrue(game.redo())
+                self.assertEqual(state(game), states[-1 - forward])
+            self.assertFalse(game.redo())
+
+            while game.undo():
+                pass
+            self.assertEqual(state(game), states[0])
+
+    def test_new_move_clears_redo(self):
+        game = BlackBoxGame(ATOMS)
+        game.start_journal()
+        game.shoot_ray(0, 5)
+        game.guess_atom(2, 2)
+        self.assertTrue(game.undo())
+        self.assertTrue(game.undo())
+        self.assertTrue(game.redo())
+        game.guess_atom(3, 2)
+        self.assertFalse(game.redo())
+        self.assertEqual(state(game), (24, 3, [(3, 2)], [(0, 5)]))
+
+    def test_no_journal(self):
+        game = BlackBoxGame(ATOMS)
+        game.shoot_ray(0, 5)
+        self.assertFalse(game.undo())
+        self.assertFalse(game.redo())
+
+    def test_edit_empties_journal(self):
+        game = BlackBoxGame(ATOMS)
+        game.start_journal()
+        game.shoot_ray(0, 5)
+        self.assertTrue(game.add_atom(5, 5))
+        self.assertFalse(game.undo())
+
+
+class CloneTest(unittest.TestCase):
+
+    def test_play_does_not_leak(self):
+        rng = random.Random(1)
+        game = BlackBoxGame(ATOMS)
+        for _ in range(10):
+            random_move(game, rng)
+        before = state(game)
+        copy = game.clone()
+        self.assertEqual(state(copy), before)
+        for _ in range(20):
+            random_move(copy, rng)
+        self.assertEqual(state(game), before)
+        after = state(copy)
+        for _ in range(20):
+            random_move(game, rng)
+        self.assertEqual(state(copy), after)
+
+    def test_clone_journal_starts_empty(self):
+        game = BlackBoxGame(ATOMS)
+        game.start_journal()
+        game.shoot_ray(0, 5)
+        copy = game.clone()
+        self.assertFalse(copy.undo())
+        copy.guess_atom(2, 2)
+        self.assertTrue(copy.undo())
+        self.assertTrue(game.undo())
+        self.assertEqual(game.get_score(), 25)
+
+    def assertLayout(self, game, atoms):
+        fresh = BlackBoxGame(atoms)
+        self.assertEqual(sorted(game._atom_locations), sorted(atoms))
+        self.assertEqual(dict(game.ray_table()), dict(fresh.ray_table()))
+        for row in range(10):
+            for column in range(10):
+                self.assertEqual(game._game_board[row][column] == 'A',
+                                 (row, column) in atoms)
+
+    def test_edits_do_not_leak(self):
+        # each side edited, before and after the ray outcomes and the ray index exist
+        for table_first, index_first, edit_clone in ((False, False, False),
+                                                     (True, False, True),
+                                                     (True, True, False),
+                                                     (True, True, True)):
+            game = BlackBoxGame(ATOMS)
+            if table_first:
+                game.build_ray_table()
+            if index_first:
+                self.assertTrue(game.add_atom(6, 2))
+                self.assertTrue(game.remove_atom(6, 2))
+            copy = game.clone()
+            edited, other = (copy, game) if edit_clone else (game, copy)
+            self.assertTrue(edited.add_atom(5, 5))
+            self.assertTrue(edited.remove_atom(3, 2))
+            edited_atoms = [(1, 7), (4, 6), (8, 8), (5, 5)]
+            self.assertLayout(edited, edited_atoms)
+            self.assertLayout(other, ATOMS)
+
+            # editing the other side afterwards leaves the first alone too
+            self.assertTrue(other.remove_atom(8, 8))
+            self.assertLayout(other, [(3, 2), (1, 7), (4, 6)])
+            self.assertLayout(edited, edited_atoms)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# Description: Tests of the game server protocol, sending request lines
+#              straight to GameServer.handle_line without a network
+#              connection. Run from the repository root with
+#                  python -m unittest discover tests
+
+import json
+import time
+import unittest
+
+from server import GameServer
+
+
+class ServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GameServer()
+
+    def send(self, request):
+        """
+        Answers one request
+        :param request: dictionary of the request, or bytes of the raw line
+        :return: dictionary of the reply
+        """
+        line = request if isinstance(request, bytes) else json.dumps(request).encode()
+        reply = self.server.handle_line(line)
+        self.assertTrue(reply.endswith(b'\n'))
+        return json.loads(reply)
+
+    def assertError(self, request, message=None):
+        reply = self.send(request)
+        self.assertFalse(reply['ok'], reply)
+        if message is not None:
+            self.assertIn(message, reply['error'])
+        return reply
+
+    def new_game(self, atoms, size=10):
+        reply = self.send({'op': 'new', 'atoms': atoms, 'size': size})
+        self.assertTrue(reply['ok'], reply)
+        return reply['result']
+
+
+class PlayTest(ServerTestCase):
+
+    def test_game(self):
+        session = self.new_game([[3, 5]])
+        self.assertEqual(self.send({'op': 'shoot_ray', 'session': session, 'row': 0,
+                                    'column': 4, 'id': 7}),
+                         {'ok': True, 'result': [2, 0], 'id': 7})
+        self.assertEqual(self.send({'op': 'get_score', 'session': session})['result'], 23)
+        self.assertTrue(self.send({'op': 'guess_atom', 'session': session, 'row': 3,
+                                   'column': 5})['result'])
+        self.assertEqual(self.send({'op': 'atoms_left', 'session': session})['result'], 0)
+        self.assertTrue(self.send({'op': 'close', 'session': session})['result'])
+        self.assertError({'op': 'get_score', 'session': session}, 'no session')
+
+    def test_random_atoms(self):
+        session = self.new_game(5, 12)
+        self.assertEqual(self.send({'op': 'atoms_left', 'session': session})['result'], 5)
+
+
+class BadRequestTest(ServerTestCase):
+
+    def test_not_a_request(self):
+        self.assertError(b'not json')
+        self.assertError(b'[1, 2]', 'JSON object')
+        self.assertError({'op': 'fly'}, 'no session')
+        session = self.new_game(2)
+        self.assertError({'op': 'fly', 'session': session}, 'unknown op')
+
+    def test_nested_too_deeply(self):
+        reply = self.assertError(b'[' * 100000, 'nested too deeply')
+        self.assertNotIn('id', reply)
+
+    def test_bad_squares(self):
+        session = self.new_game([[4, 4]])
+        for row, column in ((10, 4), (-1, 4), (4, 10**30), (True, 4), (4, '4'), (4, None)):
+            self.assertError({'op': 'shoot_ray', 'session': session, 'row': row,
+                              'column': column})
+            self.assertError({'op': 'guess_atom', 'session': session, 'row': row,
+                              'column': column})
+        self.assertEqual(self.send({'op': 'get_score', 'session': session})['result'], 25)
+
+    def test_bad_new_games(self):
+        for size in (2, 201, True, '10', 10.0):
+            self.assertError({'op': 'new', 'atoms': 1, 'size': size}, 'size')
+        for atoms in (-1, 65, 3000000, True):
+            self.assertError({'op': 'new', 'atoms': atoms}, 'atoms')
+        self.assertError({'op': 'new', 'atoms': [[0, 4]]}, 'inside the border')
+        self.assertError({'op': 'new', 'atoms': [[1, True]]}, 'inside the border')
+        self.assertError({'op': 'new', 'atoms': [[1, 1], [1, 1]]}, 'distinct')
+        self.assertError({'op': 'new', 'atoms': [[1, 1, 1]]})
+        self.assertError({'op': 'new', 'atoms': {'1': 1}})
+        self.assertError({'op': 'new', 'atoms': [[1, 1]] * 1001, 'size': 200}, 'at most')
+        self.assertEqual(self.server.session_count(), 0)
+
+    def test_large_new_game_is_quick(self):
+        start = time.perf_counter()
+        self.new_game(1000, 200)
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_too_many_sessions(self):
+        self.server = GameServer(max_sessions=2)
+        self.new_game(1)
+        self.new_game(1)
+        self.assertError({'op': 'new', 'atoms': 1}, 'too many sessions')
+
+
+class EvictionTest(ServerTestCase):
+
+    def test_idle_sessions_evicted(self):
+        self.server = GameServer(idle_timeout=10)
+        old = self.new_game(1)
+        used = self.new_game(1)
+        for session in (old, used):
+            self.server._sessions[session][1] -= 20
+
+        # a request moves its session to the back of the queue and marks it as used now
+        self.assertTrue(self.send({'op': 'get_score', 'session': used})['ok'])
+        now = time.monotonic()
+        self.assertEqual(self.server.evict_idle_sessions(now), 1)
+        self.assertError({'op': 'get_score', 'session': old}, 'no session')
+        self.assertEqual(self.server.evict_idle_sessions(now + 5), 0)
+        self.assertEqual(self.server.evict_idle_sessions(now + 11), 1)
+        self.assertEqual(self.server.session_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# Description: Tests of the signature index in signature_index.py, built
+#              for every layout of 4 atoms on a 6x6 board and checked
+#              against the ray tables of BlackBoxGame games of every one
+#              of those layouts. Run from the repository root with
+#                  python -m unittest discover tests
+
+import itertools
+import json
+import os
+import tempfile
+import unittest
+
+from black_box import BlackBoxGame, entry_points
+from signature_index import SignatureIndex, build_index, symmetries
+
+SIZE = 6
+ATOMS = 4
+
+
+class SignatureIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = tempfile.TemporaryDirectory()
+        cls.summary = build_index(ATOMS, cls._directory.name, SIZE, shards=4, workers=1)
+        cls.index = SignatureIndex(cls._directory.name)
+
+        # layouts grouped by the outcome of every entry point, found by playing them
+        interior = [(row, column) for row in range(1, SIZE - 1) for column in range(1, SIZE - 1)]
+        cls.layouts = list(itertools.combinations(interior, ATOMS))
+        cls.groups = {}
+        for atoms in cls.layouts:
+            game = BlackBoxGame(atoms, SIZE)
+            signature = tuple(game.trace_ray(row, column) for row, column in entry_points(SIZE))
+            cls.groups.setdefault(signature, []).append(atoms)
+        cls.group_of = {atoms: group for group in cls.groups.values() for atoms in group}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._directory.cleanup()
+
+    def test_summary(self):
+        self.assertEqual(self.summary['layouts'], len(self.layouts))
+        orbits = {min(tuple(sorted(transform(*atom) for atom in atoms))
+                      for transform in symmetries(SIZE))
+                  for atoms in self.layouts}
+        self.assertEqual(self.summary['canonical_layouts'], len(orbits))
+        with open(os.path.join(self._directory.name, 'index.json')) as summary_file:
+            self.assertEqual(json.load(summary_file), self.summary)
+
+    def test_indistinguishable_matches_games(self):
+        for atoms in self.layouts[::3]:
+            found = self.index.indistinguishable(list(atoms))
+            self.assertEqual(found, [list(layout) for layout in self.group_of[atoms]])
+
+    def test_ambiguity_classes(self):
+        with open(os.path.join(self._directory.name, 'ambiguous.jsonl')) as ambiguous_file:
+            classes = [sorted(tuple(tuple(atom) for atom in atoms) for atoms in json.loads(line))
+                       for line in ambiguous_file]
+        self.assertEqual(len(classes), self.summary['ambiguity_classes'])
+        self.assertEqual(len(classes), 11)
+        self.assertEqual(sum(map(len, classes)), self.summary['layouts_in_classes'])
+
+        # each class is a whole group of layouts, and moving the classes by every symmetry
+        # gives every group of more than one layout
+        for layout_class in classes:
+            self.assertEqual(layout_class, self.group_of[layout_class[0]])
+        moved = {tuple(sorted(tuple(sorted(transform(*atom) for atom in atoms))
+                              for atoms in layout_class))
+                 for layout_class in classes for transform in symmetries(SIZE)}
+        expected = {tuple(group) for group in self.groups.values() if len(group) > 1}
+        self.assertEqual(moved, expected)
+
+    def test_wrong_number_of_atoms(self):
+        self.assertRaises(ValueError, self.index.indistinguishable, [(1, 1), (2, 2)])
+        self.assertRaises(ValueError, self.index.indistinguishable, [(1, 1), (1, 1), (2, 2)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Description: Tests of the simulator's game tracking, players and
+#              sharding. Run from the repository root with
+#                  python -m unittest discover tests
+
+import random
+import unittest
+
+from black_box import BlackBoxGame, entry_points
+from compact_black_box import CompactBlackBoxGame
+from simulator import (PLAYERS, SimulationStats, TrackedGame, player_function,
+                       random_player, run_shard, simulate)
+
+
+def corner_player(game, rng, atom_count, size):
+    """
+    Shoots only the first entry point, then guesses squares in order
+    """
+    game.shoot_ray(*entry_points(size)[0])
+    for row in range(1, size - 1):
+        for column in range(1, size - 1):
+            if game.atoms_left() == 0:
+                return
+            game.guess_atom(row, column)
+
+
+def totals(stats):
+    """
+    Returns everything a SimulationStats has counted
+    """
+    return (stats.games, dict(stats.costs), dict(stats.rays), stats.correct_guesses,
+            stats.wrong_guesses)
+
+
+class TrackedGameTest(unittest.TestCase):
+
+    def test_points_used_matches_the_game(self):
+        rng = random.Random(0)
+        for game_class in (BlackBoxGame, CompactBlackBoxGame):
+            for _ in range(50):
+                game = TrackedGame(game_class([(3, 2), (4, 7), (6, 6)]))
+                random_player(game, rng, 3, 10)
+                used = len(game._game.get_used_points())
+                self.assertEqual(game.points_used(), used)
+                self.assertEqual(game.get_score(), 25 - used - 5 * len(game.wrong_guesses))
+
+    def test_points_used_ignores_the_score(self):
+        # the count comes from the game itself, so it holds even if the score does not
+        # start at 25
+        game = TrackedGame(CompactBlackBoxGame([(3, 2)]))
+        game._game._score = 40
+        game.shoot_ray(0, 5)
+        game.shoot_ray(3, 0)
+        self.assertEqual(game.points_used(), 3)
+        self.assertEqual(game.rays, 2)
+
+
+class PlayerTest(unittest.TestCase):
+
+    def test_players_by_name(self):
+        for name, play in PLAYERS.items():
+            self.assertIs(player_function(name), play)
+        self.assertRaises(ValueError, player_function, 'nobody')
+
+    def test_player_functions(self):
+        self.assertIs(player_function(corner_player), corner_player)
+        self.assertRaises(ValueError, player_function, lambda *args: None)
+        self.assertRaises(ValueError, player_function, 3)
+
+    def test_run_shard_with_a_function(self):
+        stats = run_shard((0, 0, 20, 3, 8, corner_player))
+        self.assertEqual(stats.games, 20)
+        self.assertEqual(dict(stats.rays), {1: 20})
+
+
+class SimulateTest(unittest.TestCase):
+
+    def test_function_reaches_the_workers(self):
+        runs = [list(simulate(30, 3, 8, corner_player, 1, 10, workers))[-1]
+                for workers in (1, 2)]
+        self.assertEqual(totals(runs[0]), totals(runs[1]))
+        self.assertEqual(dict(runs[0].rays), {1: 30})
+
+    def test_name_and_function_agree(self):
+        by_name = list(simulate(20, 3, 8, 'hit', 2, 10, 1))[-1]
+        by_function = list(simulate(20, 3, 8, PLAYERS['hit'], 2, 10, 1))[-1]
+        self.assertEqual(totals(by_name), totals(by_function))
+
+    def test_unknown_player(self):
+        self.assertRaises(ValueError, list, simulate(10, player='nobody'))
+
+    def test_merge(self):
+        stats = SimulationStats().merge(run_shard((0, 0, 10, 3, 8, random_player)))
+        stats.merge(run_shard((0, 1, 10, 3, 8, random_player)))
+        self.assertEqual(stats.games, 20)
+        self.assertEqual(sum(stats.scores().values()), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# Description: Tests of game snapshots (to_bytes and from_bytes of both
+#              game classes) and of the SessionStore file that holds
+#              them. Run from the repository root with
+#                  python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+
+from black_box import BlackBoxGame
+from compact_black_box import CompactBlackBoxGame
+from snapshot import SessionStore, snapshot_length, unpack_state
+
+ATOMS = [(3, 2), (1, 7), (4, 6), (8, 8)]
+
+
+def played(game_class, size=10):
+    """
+    Makes a game with some shots, a right guess and a wrong guess made
+    :param game_class: BlackBoxGame or CompactBlackBoxGame
+    :param size: integer number of rows (and columns) of the board
+    :return: game of the given class
+    """
+    game = game_class(ATOMS, size)
+    game.shoot_ray(0, 2)
+    game.shoot_ray(5, 0)
+    game.shoot_ray(0, 5)
+    game.guess_atom(3, 2)
+    game.guess_atom(5, 5)
+    return game
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def assertRoundTrip(self, game_class, restore_class):
+        game = played(game_class)
+        data = game.to_bytes()
+        self.assertEqual(len(data), snapshot_length(10))
+        restored = restore_class.from_bytes(data)
+        self.assertEqual(restored.to_bytes(), data)
+        self.assertEqual(restored.get_size(), 10)
+        self.assertEqual(restored.get_score(), game.get_score())
+        self.assertEqual(restored.atoms_left(), 3)
+        self.assertEqual(sorted(restored.get_used_points()), sorted(game.get_used_points()))
+
+        # guesses and entry/exit points already made are not charged for again
+        score = restored.get_score()
+        self.assertFalse(restored.guess_atom(5, 5))
+        self.assertTrue(restored.guess_atom(3, 2))
+        self.assertEqual(restored.atoms_left(), 3)
+        for row, column in game.get_used_points():
+            restored.shoot_ray(row, column)
+        self.assertEqual(restored.get_score(), score)
+
+        # and the atoms are where they were
+        self.assertTrue(restored.guess_atom(8, 8))
+        self.assertEqual(restored.atoms_left(), 2)
+        self.assertEqual(restored.shoot_ray(0, 2), game_class(ATOMS).shoot_ray(0, 2))
+
+    def test_black_box_game(self):
+        self.assertRoundTrip(BlackBoxGame, BlackBoxGame)
+
+    def test_compact_game(self):
+        self.assertRoundTrip(CompactBlackBoxGame, CompactBlackBoxGame)
+
+    def test_between_classes(self):
+        self.assertRoundTrip(BlackBoxGame, CompactBlackBoxGame)
+        self.assertRoundTrip(CompactBlackBoxGame, BlackBoxGame)
+        self.assertEqual(played(BlackBoxGame).to_bytes(), played(CompactBlackBoxGame).to_bytes())
+
+    def test_other_sizes(self):
+        for size in (3, 7, 31):
+            game = BlackBoxGame([(1, 1)], size)
+            game.shoot_ray(0, 1)
+            restored = CompactBlackBoxGame.from_bytes(game.to_bytes())
+            self.assertEqual(restored.get_size(), size)
+            self.assertEqual(restored.to_bytes(), game.to_bytes())
+
+    def test_wrong_length(self):
+        data = played(BlackBoxGame).to_bytes()
+        self.assertRaises(ValueError, unpack_state, data[:-1])
+        self.assertRaises(ValueError, BlackBoxGame.from_bytes, data + b'\0')
+
+
+class SessionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'sessions.bbx')
+
+    def test_save_load_delete(self):
+        with SessionStore.create(self.path, 4) as store:
+            self.assertEqual(len(store), 4)
+            self.assertIsNone(store.load(2, BlackBoxGame))
+            store.save(2, played(BlackBoxGame))
+            store.save(3, CompactBlackBoxGame(ATOMS))
+            self.assertEqual(store.load(2, CompactBlackBoxGame).to_bytes(),
+                             played(BlackBoxGame).to_bytes())
+            store.delete(3)
+            self.assertIsNone(store.load(3, BlackBoxGame))
+            self.assertRaises(IndexError, store.load, 4, BlackBoxGame)
+            self.assertRaises(IndexError, store.save, -1, CompactBlackBoxGame(ATOMS))
+            self.assertRaises(ValueError, store.save, 0, BlackBoxGame([(1, 1)], 12))
+
+        with SessionStore(self.path) as store:
+            self.assertEqual(store.load(2, BlackBoxGame).get_score(),
+                             played(BlackBoxGame).get_score())
+            self.assertIsNone(store.load(3, BlackBoxGame))
+
+    def test_grow_and_reopen(self):
+        with SessionStore.create(self.path, 2, size=8) as store:
+            store.save(1, BlackBoxGame([(2, 2)], 8))
+            store.grow(5)
+            self.assertEqual(len(store), 5)
+            self.assertIsNone(store.load(4, BlackBoxGame))
+            store.save(4, BlackBoxGame([(3, 3)], 8))
+            self.assertRaises(ValueError, store.grow, 3)
+
+        with SessionStore(self.path) as store:
+            self.assertEqual(len(store), 5)
+            self.assertEqual(store.size, 8)
+            self.assertEqual(store.load(1, BlackBoxGame)._atom_locations, [(2, 2)])
+            self.assertEqual(store.load(4, BlackBoxGame)._atom_locations, [(3, 3)])
+
+    def test_bad_files(self):
+        with open(self.path, 'wb') as store_file:
+            store_file.write(b'not a store at all')
+        self.assertRaises(ValueError, SessionStore, self.path)
+
+        SessionStore.create(self.path, 3).close()
+        with open(self.path, 'r+b') as store_file:
+            store_file.truncate(os.path.getsize(self.path) - 1)
+        self.assertRaises(ValueError, SessionStore, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
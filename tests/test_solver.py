@@ -0,0 +1,85 @@
+# Description: Tests of the SignatureTable and AtomSolver in solver.py,
+#              checked against BlackBoxGame on every layout of a small
+#              board. Run from the repository root with
+#                  python -m unittest discover tests
+
+import random
+import unittest
+
+from batch_trace import HIT, REFLECTION
+from black_box import BlackBoxGame, entry_points
+from solver import AtomSolver, SignatureTable, exit_to_outcome
+
+# every layout of 3 atoms on a 6x6 board, shared by the tests
+TABLE = SignatureTable(3, 6)
+
+
+class ExitToOutcomeTest(unittest.TestCase):
+
+    def test_outcomes(self):
+        self.assertEqual(exit_to_outcome((0, 4), None), HIT)
+        self.assertEqual(exit_to_outcome((0, 4), (0, 4)), REFLECTION)
+        self.assertEqual(exit_to_outcome((0, 4), [0, 4]), REFLECTION)
+        self.assertEqual(exit_to_outcome((0, 4), (9, 4)), entry_points().index((9, 4)))
+        self.assertEqual(exit_to_outcome((0, 2), (2, 5), 6), entry_points(6).index((2, 5)))
+
+    def test_bad_exit(self):
+        for exit_point in ((0, 0), (4, 4), (10, 4)):
+            self.assertRaises(ValueError, exit_to_outcome, (0, 4), exit_point)
+
+
+class AtomSolverTest(unittest.TestCase):
+
+    def test_table_matches_games(self):
+        signatures = TABLE.build()
+        self.assertEqual(len(TABLE.layouts), 560)
+        for index in range(0, len(TABLE.layouts), 7):
+            game = BlackBoxGame(TABLE.layout_atoms(index), 6)
+            for column, (row, entry_column) in enumerate(TABLE.entries):
+                self.assertEqual(signatures[index, column],
+                                 exit_to_outcome((row, entry_column),
+                                                 game.trace_ray(row, entry_column), 6))
+
+    def test_observe_keeps_exactly_the_consistent_layouts(self):
+        rng = random.Random(0)
+        games = [BlackBoxGame(TABLE.layout_atoms(index), 6)
+                 for index in range(len(TABLE.layouts))]
+        for _ in range(20):
+            index = rng.randrange(len(TABLE.layouts))
+            game = BlackBoxGame(TABLE.layout_atoms(index), 6)
+            solver = AtomSolver(TABLE)
+            shots = []
+            for row, column in rng.sample(TABLE.entries, 4):
+                exit_point = game.shoot_ray(row, column)
+                shots.append(((row, column), exit_point))
+                remaining = solver.observe((row, column), exit_point)
+                expected = [other for other, candidate in enumerate(games)
+                            if all(candidate.trace_ray(*entry) == result
+                                   for entry, result in shots)]
+                self.assertEqual(list(solver.candidate_indices()), expected)
+                self.assertEqual(remaining, len(expected))
+                self.assertIn(index, expected)
+            self.assertIn(sorted(game._atom_locations), solver.candidates())
+            self.assertAlmostEqual(solver.probabilities().sum(), 3)
+
+    def test_not_allowed_entries(self):
+        solver = AtomSolver(TABLE)
+        self.assertEqual(solver.observe((3, 3), False), 560)
+        for entry in ((3, 3), (0, 0), (0, 6), (-1, 2)):
+            self.assertRaises(ValueError, solver.observe, entry, None)
+        self.assertRaises(ValueError, solver.observe, (0, 2), (4, 4))
+        self.assertEqual(solver.candidate_count(), 560)
+
+    def test_candidate_indices_read_only(self):
+        solver = AtomSolver(TABLE)
+        solver.observe((0, 2), None)
+        count = solver.candidate_count()
+        candidates = solver.candidate_indices()
+        with self.assertRaises(ValueError):
+            candidates[0] = 0
+        self.assertEqual(solver.candidate_count(), count)
+        self.assertEqual(solver.observe((0, 2), None), count)
+
+
+if __name__ == '__main__':
+    unittest.main()